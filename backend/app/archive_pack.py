@@ -0,0 +1,126 @@
+"""
+Month packs: a manager's archived slips and CSVs of one month as a single ZIP,
+streamed straight from the blobs. Members are STORED (PDFs are compressed
+already), and their sizes and CRC-32s come from archive_entries. So the whole
+byte layout, the total length included, is known before anything is read. Any
+byte range can then be produced on demand: memory does not grow with the pack,
+nothing is staged on disk, and downloads can resume with HTTP Range requests.
+"""
+from bisect import bisect_right
+from datetime import datetime
+from typing import Iterator, Sequence
+import struct
+
+_LOCAL_HEADER = struct.Struct("<IHHHHHIIIHH")
+_CENTRAL_HEADER = struct.Struct("<IHHHHHHIIIHHHHHII")
+_END_RECORD = struct.Struct("<IHHHHIIH")
+_VERSION = 20  # 2.0 covers STORED members; no zip64
+_MADE_BY = (3 << 8) | _VERSION  # unix, so the mode below applies
+_UTF8_NAMES = 0x0800
+_FILE_MODE = 0o100644 << 16
+_ZIP32_MAX = 0xFFFFFFFF
+_READ_SIZE = 1 << 16
+
+
+class PackTooLarge(ValueError):
+    """The pack needs zip64 (4 GiB or more, or over 65535 files)."""
+
+
+class PackMember:
+    __slots__ = ("arcname", "path", "size", "crc32", "modified")
+
+    def __init__(self, arcname: str, path: str, size: int, crc32: int, modified: datetime):
+        self.arcname = arcname
+        self.path = path
+        self.size = size
+        self.crc32 = crc32
+        self.modified = modified
+
+
+def _dos_datetime(dt: datetime) -> tuple[int, int]:
+    dt = max(dt, datetime(1980, 1, 1))
+    return (dt.hour << 11) | (dt.minute << 5) | (dt.second // 2), ((dt.year - 1980) << 9) | (dt.month << 5) | dt.day
+
+
+class ZipPack:
+    """The byte layout of a STORED ZIP of `members`, as a list of segments (header bytes or file spans)."""
+
+    def __init__(self, members: Sequence[PackMember]):
+        if len(members) > 0xFFFF:
+            raise PackTooLarge(f"{len(members)} files")
+        self._starts: list[int] = []
+        self._segments: list[tuple[int, bytes | str]] = []  # (length, bytes or file path)
+        self.size = 0
+
+        central = []
+        for m in members:
+            name = m.arcname.encode("utf-8")
+            time_, date_ = _dos_datetime(m.modified)
+            central.append(_CENTRAL_HEADER.pack(
+                0x02014B50, _MADE_BY, _VERSION, _UTF8_NAMES, 0, time_, date_, m.crc32, m.size, m.size,
+                len(name), 0, 0, 0, 0, _FILE_MODE, self.size,
+            ) + name)
+            self._add(_LOCAL_HEADER.pack(
+                0x04034B50, _VERSION, _UTF8_NAMES, 0, time_, date_, m.crc32, m.size, m.size, len(name), 0,
+            ) + name)
+            self._add(m.path, m.size)
+
+        directory = b"".join(central)
+        directory_offset = self.size
+        self._add(directory)
+        self._add(_END_RECORD.pack(0x06054B50, 0, 0, len(members), len(members), len(directory), directory_offset, 0))
+        if self.size > _ZIP32_MAX:
+            raise PackTooLarge(f"{self.size} bytes")
+
+    def _add(self, data: bytes | str, length: int | None = None):
+        length = len(data) if length is None else length
+        if length:
+            self._starts.append(self.size)
+            self._segments.append((length, data))
+            self.size += length
+
+    def iter_bytes(self, start: int = 0, end: int | None = None) -> Iterator[bytes]:
+        """Yield bytes start..end (inclusive) of the ZIP."""
+        end = self.size - 1 if end is None else end
+        i = bisect_right(self._starts, start) - 1
+        pos = start
+        while pos <= end and i < len(self._segments):
+            seg_start = self._starts[i]
+            length, data = self._segments[i]
+            lo, hi = pos - seg_start, min(length, end - seg_start + 1)
+            if isinstance(data, bytes):
+                yield data[lo:hi]
+            else:
+                with open(data, "rb") as f:
+                    f.seek(lo)
+                    remaining = hi - lo
+                    while remaining > 0:
+                        chunk = f.read(min(_READ_SIZE, remaining))
+                        if not chunk:
+                            raise OSError(f"{data} is shorter than the archive catalog says")
+                        remaining -= len(chunk)
+                        yield chunk
+            pos = seg_start + hi
+            i += 1
+
+
+def parse_range(header: str | None, size: int) -> tuple[int, int] | None:
+    """
+    The (start, end) of a single "bytes=" range, or None to send the whole body
+    (no header, several ranges, or a unit we don't serve). Raises ValueError if
+    the range cannot be satisfied.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    first, _, last = header[len("bytes="):].strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+        else:  # suffix: the last N bytes
+            start, end = max(size - int(last), 0), size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, min(end, size - 1)
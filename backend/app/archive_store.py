@@ -0,0 +1,164 @@
+"""
+Content-addressed archive. Every distinct file content is stored once, as
+storage/archive/blobs/<first two hex digits>/<sha256>. The names users see,
+storage/archive/{pdf,csv}/<name>, are hard links to those blobs. Each is recorded
+in archive_entries together with the employee, manager and month it belongs to.
+Archiving a file whose content is already stored only adds a link and a row.
+Blobs are never modified; on filesystems without hard links the published
+name is a copy. CSV blobs also get gzip (and, with the brotli package, brotli)
+variants next to them (<sha256>.gz / .br) for app.routers_files to serve.
+"""
+from datetime import date, datetime
+from typing import Iterator
+import gzip, hashlib, os, shutil, threading, zlib
+
+try:  # optional: brotli variants of CSV blobs
+    import brotli
+except ImportError:
+    brotli = None
+
+from sqlalchemy.orm import Session
+
+from app.db import upsert_insert
+from app.models import ArchiveEntry
+from app.metrics import timed
+
+ARCHIVE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "storage", "archive"))
+BLOB_DIR = os.path.join(ARCHIVE_DIR, "blobs")
+ARCHIVE_KINDS = ("pdf", "csv")
+PRECOMPRESSED_KINDS = ("csv",)  # PDFs are compressed already
+
+
+def blob_path(sha256: str) -> str:
+    return os.path.join(BLOB_DIR, sha256[:2], sha256)
+
+
+def archive_path(kind: str, name: str) -> str:
+    return os.path.join(ARCHIVE_DIR, kind, name)
+
+
+def file_digests(path: str) -> tuple[str, int]:
+    """SHA-256 (the blob key) and CRC-32 (for ZIP packs, see app.archive_pack) of a file."""
+    h, crc = hashlib.sha256(), 0
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+            crc = zlib.crc32(block, crc)
+    return h.hexdigest(), crc
+
+
+def _tmp_name(path: str) -> str:
+    return f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+
+
+def _link(src: str, dst: str):
+    """Point `dst` at the same file as `src`, replacing whatever `dst` was."""
+    if os.path.exists(dst) and os.path.samefile(src, dst):
+        return
+    tmp = _tmp_name(dst)
+    try:
+        os.link(src, tmp)
+    except OSError:
+        shutil.copyfile(src, tmp)
+    os.replace(tmp, dst)
+    if os.path.lexists(tmp):
+        os.remove(tmp)  # rename() is a no-op when both names already are the same file
+
+
+def _put_blob(sha256: str, data: bytes | None = None, src: str | None = None, move: bool = False) -> str:
+    """Store content under its hash, from `data` or the file `src`, unless it is already there."""
+    dst = blob_path(sha256)
+    if os.path.exists(dst):
+        if move:
+            os.remove(src)
+        return dst
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    if move:
+        os.replace(src, dst)
+    elif data is not None:
+        tmp = _tmp_name(dst)
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, dst)
+    else:
+        _link(src, dst)
+    return dst
+
+
+def _precompress(blob: str):
+    """Write the .gz / .br variants of a blob that are missing and smaller than it."""
+    encoders = [(".gz", lambda data: gzip.compress(data, 9, mtime=0))]
+    if brotli is not None:
+        encoders.append((".br", lambda data: brotli.compress(data, quality=11)))
+    data = None
+    for suffix, encode in encoders:
+        if os.path.exists(blob + suffix):
+            continue
+        if data is None:
+            with open(blob, "rb") as f:
+                data = f.read()
+        encoded = encode(data)
+        if len(encoded) < len(data):
+            tmp = _tmp_name(blob + suffix)
+            with open(tmp, "wb") as f:
+                f.write(encoded)
+            os.replace(tmp, blob + suffix)
+
+
+def _publish(db: Session, kind: str, name: str, sha256: str, crc32: int, size: int,
+             manager_id: int | None, user_id: int | None, month: date | None) -> str:
+    if kind not in ARCHIVE_KINDS:
+        raise ValueError(f"Unknown archive kind {kind!r}")
+    path = archive_path(kind, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    _link(blob_path(sha256), path)
+    if kind in PRECOMPRESSED_KINDS:
+        _precompress(blob_path(sha256))
+
+    values = dict(kind=kind, name=name, sha256=sha256, crc32=crc32, size_bytes=size, manager_id=manager_id,
+                  user_id=user_id, month=month and month.replace(day=1), created_at=datetime.utcnow())
+    stmt = upsert_insert(db.connection(), ArchiveEntry).values(**values)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["kind", "name"],
+        set_={k: stmt.excluded[k] for k in values if k not in ("kind", "name")},
+    ))
+    return path
+
+
+@timed("archive.store")
+def archive_bytes(db: Session, data: bytes, kind: str, name: str, *, manager_id: int | None = None,
+                  user_id: int | None = None, month: date | None = None) -> str:
+    """Archive `data` as {kind}/{name}; returns the published path. The caller commits."""
+    sha256 = hashlib.sha256(data).hexdigest()
+    _put_blob(sha256, data=data)
+    return _publish(db, kind, name, sha256, zlib.crc32(data), len(data), manager_id, user_id, month)
+
+
+@timed("archive.store")
+def archive_file(db: Session, path: str, kind: str, name: str, *, sha256: str | None = None,
+                 crc32: int | None = None, move: bool = False, manager_id: int | None = None,
+                 user_id: int | None = None, month: date | None = None) -> str:
+    """
+    Archive the file at `path` as {kind}/{name}; returns the published path. With
+    move=True the file itself becomes the blob (or is removed if the content is
+    already stored), so it must not be written to afterwards. Pass `sha256` and
+    `crc32` when already known to skip reading the file. The caller commits.
+    """
+    if sha256 is None or crc32 is None:
+        sha256, crc32 = file_digests(path)
+    size = os.path.getsize(path)
+    _put_blob(sha256, src=path, move=move)
+    return _publish(db, kind, name, sha256, crc32, size, manager_id, user_id, month)
+
+
+def iter_blobs() -> Iterator[tuple[str, str]]:
+    """(sha256, path) of every stored blob."""
+    if not os.path.isdir(BLOB_DIR):
+        return
+    for prefix in sorted(os.listdir(BLOB_DIR)):
+        subdir = os.path.join(BLOB_DIR, prefix)
+        if not os.path.isdir(subdir):
+            continue
+        for name in sorted(os.listdir(subdir)):
+            if len(name) == 64:  # skips in-progress .tmp / .part files
+                yield name, os.path.join(subdir, name)
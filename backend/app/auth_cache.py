@@ -0,0 +1,107 @@
+from collections import OrderedDict
+import threading, time
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import User, UserRole
+from app.metrics import collector
+
+
+class AuthUser:
+    """The logged-in user's fields that authorization and the handlers use, detached from any session."""
+    __slots__ = ("id", "email", "first_name", "last_name", "role", "manager_id")
+
+    def __init__(self, id: int, email: str, first_name: str, last_name: str,
+                 role: UserRole, manager_id: int | None):
+        self.id = id
+        self.email = email
+        self.first_name = first_name
+        self.last_name = last_name
+        self.role = role
+        self.manager_id = manager_id
+
+    @classmethod
+    def from_user(cls, user: User) -> "AuthUser":
+        return cls(user.id, user.email, user.first_name, user.last_name, user.role, user.manager_id)
+
+    def __repr__(self) -> str:
+        return f"AuthUser(id={self.id}, role={self.role.value})"
+
+
+class UserCache:
+    """
+    LRU of AuthUser by id whose entries expire after `ttl` seconds. Changes made
+    through the ORM invalidate entries in this process right away (see below);
+    other processes see them once the TTL runs out.
+    """
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[int, tuple[float, AuthUser]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> AuthUser | None:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[user_id]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, user: AuthUser):
+        if self.ttl <= 0 or self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[user.id] = (time.monotonic() + self.ttl, user)
+            self._entries.move_to_end(user.id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *user_ids: int):
+        with self._lock:
+            for user_id in user_ids:
+                self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+user_cache = UserCache(settings.user_cache_size, settings.user_cache_ttl)
+
+
+@collector
+def _user_cache_metrics():
+    yield "user_cache_lookups_total", "counter", "Authenticated-user cache lookups", [
+        ({"result": "hit"}, user_cache.hits), ({"result": "miss"}, user_cache.misses),
+    ]
+
+
+# Drop users as soon as a change is flushed, and again after the commit: a request
+# that re-cached the old row in between must not keep it until the TTL.
+@event.listens_for(Session, "after_flush")
+def _invalidate_flushed_users(session: Session, flush_context):
+    ids = {obj.id for obj in (*session.dirty, *session.deleted) if isinstance(obj, User)}
+    if ids:
+        user_cache.invalidate(*ids)
+        session.info.setdefault("auth_cache_invalidate", set()).update(ids)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_users(session: Session):
+    ids = session.info.pop("auth_cache_invalidate", None)
+    if ids:
+        user_cache.invalidate(*ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_pending_invalidations(session: Session):
+    session.info.pop("auth_cache_invalidate", None)
@@ -4,10 +4,69 @@ from pydantic import Field
 class Settings(BaseSettings):
     jwt_secret: str = Field("dev-super-secret-change-me", alias="JWT_SECRET")
     jwt_expire_minutes: int = Field(60, alias="JWT_EXPIRE_MINUTES")
+    # Authenticated-user cache (id, role, manager, email, name) behind get_current_user; TTL 0 disables it
+    user_cache_size: int = Field(10000, alias="USER_CACHE_SIZE")
+    user_cache_ttl: float = Field(60, alias="USER_CACHE_TTL")  # seconds; bounds staleness across processes
+    # bcrypt cost for new hashes; existing ones are rehashed at the next successful login
+    bcrypt_rounds: int = Field(12, alias="BCRYPT_ROUNDS")
     app_env: str = Field("dev", alias="APP_ENV")
     database_url: str = Field(..., alias="DATABASE_URL")
+    # Connection pool per process. Blocking endpoints run on up to THREADS_DEFAULT +
+    # THREADS_EMAIL threads and each holds one session, plus JOB_WORKERS for jobs.
+    db_pool_size: int = Field(10, alias="DB_POOL_SIZE")
+    db_max_overflow: int = Field(20, alias="DB_MAX_OVERFLOW")
+    db_pool_recycle: int = Field(1800, alias="DB_POOL_RECYCLE")  # seconds; stay under server/proxy idle timeouts
+    db_pool_timeout: float = Field(30, alias="DB_POOL_TIMEOUT")  # seconds to wait for a free connection
+    # Async request path (asyncpg) for /auth/me and /archives; the pool settings above apply to it too
+    db_async: bool = Field(False, alias="DB_ASYNC")
+    async_database_url: str | None = Field(None, alias="ASYNC_DATABASE_URL")
+    db_pool_slow_wait: float = Field(0.1, alias="DB_POOL_SLOW_WAIT")  # log checkouts waiting longer than this
     smtp_host: str = Field("localhost", alias="SMTP_HOST")
     smtp_port: int = Field(1025, alias="SMTP_PORT")
+    smtp_pool_size: int = Field(4, alias="SMTP_POOL_SIZE")  # parallel SMTP sessions
+    smtp_max_retries: int = Field(3, alias="SMTP_MAX_RETRIES")
+    smtp_retry_backoff: float = Field(0.5, alias="SMTP_RETRY_BACKOFF")  # seconds, doubled per attempt
+    # PDF rendering: "serial" renders in the request thread, "process" fans out to a process pool
+    pdf_render_mode: str = Field("serial", alias="PDF_RENDER_MODE")
+    pdf_pool_size: int = Field(0, alias="PDF_POOL_SIZE")  # 0 = one worker per CPU core
+    pdf_chunk_size: int = Field(32, alias="PDF_CHUNK_SIZE")
+    slip_template: str = Field("default", alias="SLIP_TEMPLATE")
+    # Reports read the precomputed payroll_month_summary table (false: aggregate raw tables every time)
+    payroll_summary: bool = Field(True, alias="PAYROLL_SUMMARY")
+    # Public holidays excluded from vacation day counts: "none" (weekdays only) or "ro"
+    holiday_calendar: str = Field("none", alias="HOLIDAY_CALENDAR")
+    # Rows fetched per server-side cursor round trip by the streaming CSV export
+    csv_stream_chunk_size: int = Field(500, alias="CSV_STREAM_CHUNK_SIZE")
+    # Worker threads per workload class for blocking endpoint code (see app.executors)
+    threads_default: int = Field(40, alias="THREADS_DEFAULT")
+    threads_email: int = Field(8, alias="THREADS_EMAIL")
+    threads_bcrypt: int = Field(0, alias="THREADS_BCRYPT")  # 0 = one per CPU core
+    # Background jobs: "inprocess" runs workers inside the API, "external" expects `python -m app.worker`
+    job_worker_mode: str = Field("inprocess", alias="JOB_WORKER_MODE")
+    job_workers: int = Field(1, alias="JOB_WORKERS")
+    job_chunk_size: int = Field(100, alias="JOB_CHUNK_SIZE")
+    job_poll_interval: float = Field(2.0, alias="JOB_POLL_INTERVAL")  # seconds
+    job_stale_after: int = Field(600, alias="JOB_STALE_AFTER")  # seconds without heartbeat before a job is retaken
+    job_max_attempts: int = Field(3, alias="JOB_MAX_ATTEMPTS")
+    # /files: when nginx marks a request with "X-Sendfile-Type: X-Accel-Redirect", hand the
+    # transfer to its internal location at this prefix (see frontend/nginx.conf) instead of
+    # streaming the file from the app
+    files_accel_prefix: str = Field("/_storage/", alias="FILES_ACCEL_PREFIX")
+    # Logging (see app.log): "json" lines or loguru's "text" format; TRACE_SAMPLE_RATE is the share
+    # of requests and jobs that also log a timing span per pipeline stage
+    log_format: str = Field("json", alias="LOG_FORMAT")
+    log_level: str = Field("INFO", alias="LOG_LEVEL")
+    log_file: str | None = Field(None, alias="LOG_FILE")  # also write JSON lines here (rotated at 100 MB)
+    trace_sample_rate: float = Field(0.01, alias="TRACE_SAMPLE_RATE")
+    # Idempotency-Key records: kept for IDEMPOTENCY_TTL seconds, then purged in batches
+    idempotency_ttl: int = Field(86400, alias="IDEMPOTENCY_TTL")
+    idempotency_cache_size: int = Field(1024, alias="IDEMPOTENCY_CACHE_SIZE")  # completed responses kept in memory
+    idempotency_wait: float = Field(30.0, alias="IDEMPOTENCY_WAIT")  # how long a duplicate waits for the first request
+    idempotency_poll_interval: float = Field(0.2, alias="IDEMPOTENCY_POLL_INTERVAL")
+    idempotency_pending_timeout: int = Field(900, alias="IDEMPOTENCY_PENDING_TIMEOUT")  # claim age before it is retaken
+    idempotency_purge_interval: float = Field(600.0, alias="IDEMPOTENCY_PURGE_INTERVAL")
+    idempotency_purge_batch: int = Field(1000, alias="IDEMPOTENCY_PURGE_BATCH")
+    idempotency_compress_min: int = Field(512, alias="IDEMPOTENCY_COMPRESS_MIN")  # bytes; smaller bodies stored as-is
 
     class Config:
         env_file = ".env"
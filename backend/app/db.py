@@ -1,13 +1,113 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, DeclarativeBase
+from sqlalchemy import create_engine, event, exc, make_url
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session, sessionmaker, DeclarativeBase
+from sqlalchemy.pool import QueuePool
+import threading, time
+from loguru import logger
 from app.config import settings
+from app.metrics import collector
 
 class Base(DeclarativeBase):
     pass
 
+class TimedQueuePool(QueuePool):
+    """
+    QueuePool that records how long callers wait for a connection. A steadily
+    growing wait (or any timeouts) means the pool is smaller than the number of
+    threads that need the database at once; see pool_stats().
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def _do_get(self):
+        t0 = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:  # not connect errors: those are the database's problem, not the pool's size
+            with self._stats_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - t0
+            with self._stats_lock:
+                self.checkouts += 1
+                self.wait_total += waited
+                self.wait_max = max(self.wait_max, waited)
+            if waited >= settings.db_pool_slow_wait:
+                logger.warning(f"DB pool checkout waited {waited * 1000:.0f} ms ({self.status()})")
+
+# INSERT .. ON CONFLICT per dialect, for the upserts of the payroll summaries and the
+# archive catalog; other databases are refused at startup instead of failing mid-request.
+_UPSERT_INSERTS = {"postgresql": pg_insert, "sqlite": sqlite_insert}
+
+def upsert_insert(conn, model):
+    """insert(model) with on_conflict_do_update / on_conflict_do_nothing for this connection."""
+    return _UPSERT_INSERTS[conn.dialect.name](model)
+
+def _check_backend(url: str):
+    backend = make_url(url).get_backend_name()
+    if backend not in _UPSERT_INSERTS:
+        raise RuntimeError(f"DATABASE_URL points to {backend}, which is not supported: use PostgreSQL "
+                           f"(or SQLite for development and tests)")
+
+def _engine_options() -> dict:
+    if settings.database_url in ("sqlite://", "sqlite:///:memory:"):
+        return {}  # single shared connection, nothing to size
+    return dict(
+        poolclass=TimedQueuePool,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_recycle=settings.db_pool_recycle,
+        pool_timeout=settings.db_pool_timeout,
+    )
+
+_check_backend(settings.database_url)
 engine = create_engine(
     settings.database_url,
     pool_pre_ping=True,
+    **_engine_options(),
 )
 
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+
+@event.listens_for(Session, "after_flush")
+def _track_payroll_changes(session: Session, flush_context):
+    # Every session, whatever the process imported: a write that skipped this would
+    # leave payroll_month_summary serving stale figures.
+    from app.payroll import track_payroll_changes  # app.payroll needs the models, which need this module
+    track_payroll_changes(session)
+
+def pool_stats() -> dict:
+    pool = engine.pool
+    stats = {"class": type(pool).__name__, "status": pool.status()}
+    if isinstance(pool, QueuePool):
+        stats.update(size=pool.size(), checked_out=pool.checkedout(), overflow=pool.overflow())
+    if isinstance(pool, TimedQueuePool):
+        with pool._stats_lock:
+            stats.update(
+                checkouts=pool.checkouts,
+                timeouts=pool.timeouts,
+                wait_avg_ms=round(pool.wait_total / pool.checkouts * 1000, 3) if pool.checkouts else 0.0,
+                wait_max_ms=round(pool.wait_max * 1000, 3),
+            )
+    return stats
+
+@collector
+def _pool_metrics():
+    pool = engine.pool
+    if isinstance(pool, QueuePool):
+        yield "db_pool_size", "gauge", "Configured pool size", [({}, pool.size())]
+        yield "db_pool_checked_out", "gauge", "Connections in use", [({}, pool.checkedout())]
+        yield "db_pool_overflow", "gauge", "Connections open beyond the pool size", [({}, pool.overflow())]
+    if isinstance(pool, TimedQueuePool):
+        with pool._stats_lock:
+            checkouts, timeouts, wait_total = pool.checkouts, pool.timeouts, pool.wait_total
+        yield "db_pool_checkouts_total", "counter", "Connection checkouts", [({}, checkouts)]
+        yield "db_pool_timeouts_total", "counter", "Checkouts that gave up after DB_POOL_TIMEOUT", [({}, timeouts)]
+        yield "db_pool_wait_seconds_total", "counter", "Time spent waiting for a connection", [({}, wait_total)]
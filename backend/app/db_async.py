@@ -0,0 +1,97 @@
+"""
+Optional async data access (DB_ASYNC=true), for the routes where the thread pool is
+the bottleneck: /auth/me and /archives. Only imported in async mode; the drivers
+(asyncpg, or aiosqlite for SQLite, plus greenlet) are in requirements.txt, and a
+missing one stops startup with a message naming it. Payroll aggregation stays on
+the sync path: it runs in job workers and in handlers that share their Session
+with with_idempotency.
+"""
+from typing import AsyncGenerator
+import importlib.util
+
+from fastapi import Depends, HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.config import settings
+from app.models import User, UserRole
+from app.auth_cache import AuthUser, user_cache
+from app.routers_auth import token_claims
+
+
+def async_database_url() -> str:
+    """ASYNC_DATABASE_URL, or DATABASE_URL with its driver swapped for asyncpg / aiosqlite."""
+    if settings.async_database_url:
+        return settings.async_database_url
+    url = settings.database_url
+    for sync_prefix, async_prefix in (
+        ("postgresql+psycopg2://", "postgresql+asyncpg://"),
+        ("postgresql://", "postgresql+asyncpg://"),
+        ("sqlite://", "sqlite+aiosqlite://"),
+    ):
+        if url.startswith(sync_prefix):
+            return async_prefix + url[len(sync_prefix):]
+    return url
+
+
+def _check_drivers(url: str):
+    driver = make_url(url).get_driver_name()
+    missing = [m for m in ("greenlet", driver) if importlib.util.find_spec(m) is None]
+    if missing:
+        raise RuntimeError(f"DB_ASYNC=true needs {' and '.join(missing)} installed "
+                           f"(pip install -r requirements.txt), or set DB_ASYNC=false")
+
+
+_check_drivers(async_database_url())
+async_engine = create_async_engine(
+    async_database_url(),
+    pool_pre_ping=True,
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    pool_recycle=settings.db_pool_recycle,
+    pool_timeout=settings.db_pool_timeout,
+)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+# ---------- crud ----------
+async def get_user(db: AsyncSession, user_id: int) -> User | None:
+    return await db.get(User, user_id)
+
+
+async def get_user_by_email(db: AsyncSession, email: str) -> User | None:
+    return await db.scalar(select(User).where(User.email == email))
+
+
+# ---------- auth dependencies ----------
+async def load_auth_user(db: AsyncSession, user_id: int) -> AuthUser:
+    user = user_cache.get(user_id)
+    if user is None:
+        row = await get_user(db, user_id)
+        if not row:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+        user = AuthUser.from_user(row)
+        user_cache.put(user)
+    return user
+
+
+async def get_current_user_async(claims: dict = Depends(token_claims),
+                                 db: AsyncSession = Depends(get_async_db)) -> AuthUser:
+    return await load_auth_user(db, int(claims["sub"]))
+
+
+async def require_manager_async(claims: dict = Depends(token_claims),
+                                db: AsyncSession = Depends(get_async_db)) -> AuthUser:
+    # same rules as routers_auth.require_manager
+    if claims.get("role") != UserRole.manager.value:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Managers only")
+    user = await load_auth_user(db, int(claims["sub"]))
+    if user.role != UserRole.manager:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Managers only")
+    return user
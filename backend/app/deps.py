@@ -10,6 +10,11 @@ from app.models import User, UserRole
 ALGORITHM = "HS256"
 
 def get_db() -> Generator[Session, None, None]:
+    """
+    The request's database session. FastAPI resolves a dependency once per request,
+    so the auth dependencies, with_idempotency and the handler all share this one
+    session (and pooled connection) instead of checking out their own.
+    """
     db = SessionLocal()
     try:
         yield db
@@ -1,17 +1,22 @@
-import smtplib
+import contextvars, queue, smtplib, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from email.message import EmailMessage
 from typing import Iterable
 
-def send_email(
+from loguru import logger
+
+from app.config import settings
+from app.metrics import timed
+
+def build_message(
     *,
-    smtp_host: str,
-    smtp_port: int,
     subject: str,
     sender: str,
     recipients: Iterable[str],
     body: str,
     attachments: list[tuple[str, bytes, str]] | None = None,  # (filename, content, mimetype)
-):
+) -> EmailMessage:
     msg = EmailMessage()
     msg["Subject"] = subject
     msg["From"] = sender
@@ -21,6 +26,156 @@ def send_email(
     for (fname, content, mimetype) in (attachments or []):
         maintype, _, subtype = mimetype.partition("/")
         msg.add_attachment(content, maintype=maintype, subtype=subtype, filename=fname)
+    return msg
+
+class DeliveryResult:
+    __slots__ = ("recipients", "ok", "attempts", "error")
+
+    def __init__(self, recipients: str, ok: bool, attempts: int, error: str | None = None):
+        self.recipients = recipients
+        self.ok = ok
+        self.attempts = attempts
+        self.error = error
+
+# Failures worth reconnecting for (dropped session, socket errors); checked after the
+# SMTP reply errors, which decide on their own whether a retry makes sense.
+TRANSIENT_ERRORS = (smtplib.SMTPServerDisconnected, OSError)
+
+class SMTPPool:
+    """
+    Keeps up to `size` SMTP sessions open and reuses them across messages.
+    A session that fails is dropped and the message retried on a fresh one,
+    with exponential backoff, up to `max_retries` extra attempts.
+    """
+    def __init__(self, host: str, port: int, *, size: int = 4, max_retries: int = 3,
+                 backoff: float = 0.5, timeout: float = 30):
+        self.host = host
+        self.port = port
+        self.size = size
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self._idle: queue.LifoQueue[smtplib.SMTP] = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def _connect(self) -> smtplib.SMTP:
+        return smtplib.SMTP(host=self.host, port=self.port, timeout=self.timeout)
+
+    @contextmanager
+    def connection(self):
+        with self._slots:
+            try:
+                smtp = self._idle.get_nowait()
+            except queue.Empty:
+                smtp = self._connect()
+            try:
+                yield smtp
+            except BaseException:
+                self._discard(smtp)
+                raise
+            self._idle.put(smtp)
+
+    @staticmethod
+    def _discard(smtp: smtplib.SMTP):
+        try:
+            smtp.close()
+        except Exception:
+            pass
+
+    @timed("email.send")  # one message, retries included
+    def send(self, msg: EmailMessage) -> DeliveryResult:
+        result = self._deliver(msg)
+        if not result.ok:
+            logger.bind(recipients=result.recipients, attempts=result.attempts).warning(
+                "Email delivery failed: {}", result.error)
+        return result
+
+    def _deliver(self, msg: EmailMessage) -> DeliveryResult:
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                with self.connection() as smtp:
+                    smtp.send_message(msg)
+                return DeliveryResult(msg["To"], True, attempt)
+            except smtplib.SMTPResponseException as e:
+                # 4xx is a temporary refusal, 5xx is final
+                error = f"{e.smtp_code} {e.smtp_error!r}"
+                if not 400 <= e.smtp_code < 500 or attempt > self.max_retries:
+                    return DeliveryResult(msg["To"], False, attempt, error)
+            except smtplib.SMTPRecipientsRefused as e:
+                return DeliveryResult(msg["To"], False, attempt, str(e.recipients))
+            except TRANSIENT_ERRORS as e:
+                error = repr(e)
+                if isinstance(e, smtplib.SMTPException) and not isinstance(e, smtplib.SMTPServerDisconnected):
+                    # smtplib's errors are OSErrors too, but the rest are about this message: don't retry
+                    return DeliveryResult(msg["To"], False, attempt, error)
+                if attempt > self.max_retries:
+                    return DeliveryResult(msg["To"], False, attempt, error)
+            logger.bind(recipients=msg["To"], attempts=attempt).info("Email attempt failed, retrying: {}", error)
+            time.sleep(self.backoff * 2 ** (attempt - 1))
+
+    def send_many(self, messages: Iterable[EmailMessage]) -> list[DeliveryResult]:
+        """Deliver messages over up to `size` parallel sessions; results keep the input order."""
+        def send_in(ctx: contextvars.Context, msg: EmailMessage) -> DeliveryResult:
+            return ctx.run(self.send, msg)  # keeps the caller's log context (request / job id)
+
+        messages = list(messages)
+        with ThreadPoolExecutor(max_workers=self.size, thread_name_prefix="smtp") as ex:
+            return list(ex.map(send_in, [contextvars.copy_context() for _ in messages], messages))
+
+    def close(self):
+        while True:
+            try:
+                smtp = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                smtp.quit()
+            except Exception:
+                self._discard(smtp)
+
+_pool: SMTPPool | None = None
+_pool_lock = threading.Lock()
+
+def get_mail_pool() -> SMTPPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SMTPPool(
+                settings.smtp_host,
+                settings.smtp_port,
+                size=settings.smtp_pool_size,
+                max_retries=settings.smtp_max_retries,
+                backoff=settings.smtp_retry_backoff,
+            )
+        return _pool
+
+def close_mail_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+def send_email(
+    *,
+    smtp_host: str,
+    smtp_port: int,
+    subject: str,
+    sender: str,
+    recipients: Iterable[str],
+    body: str,
+    attachments: list[tuple[str, bytes, str]] | None = None,  # (filename, content, mimetype)
+):
+    msg = build_message(subject=subject, sender=sender, recipients=recipients, body=body, attachments=attachments)
+
+    pool = get_mail_pool()
+    if (smtp_host, smtp_port) != (pool.host, pool.port):
+        with smtplib.SMTP(host=smtp_host, port=smtp_port) as smtp:
+            smtp.send_message(msg)
+        return
 
-    with smtplib.SMTP(host=smtp_host, port=smtp_port) as smtp:
-        smtp.send_message(msg)
+    result = pool.send(msg)
+    if not result.ok:
+        raise smtplib.SMTPException(f"Delivery to {result.recipients} failed: {result.error}")
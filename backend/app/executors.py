@@ -0,0 +1,94 @@
+from typing import Any, Callable, TypeVar
+import os, time
+
+from anyio import CapacityLimiter, to_thread
+
+from app.config import settings
+from app.metrics import collector
+
+T = TypeVar("T")
+
+# Blocking work is split by workload class so an email batch can only occupy
+# its own threads, never the ones serving /health or /auth/login.
+# Classes: "default", "email", "bcrypt" (password hashing, CPU bound: ~one thread per core).
+_limiters: dict[str, CapacityLimiter] = {}
+
+
+class WorkloadStats:
+    __slots__ = ("calls", "wait_total", "wait_max")
+
+    def __init__(self):
+        self.calls = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+
+_stats: dict[str, WorkloadStats] = {}
+
+
+def _workload_size(workload: str) -> int:
+    return {
+        "default": settings.threads_default,
+        "email": settings.threads_email,
+        "bcrypt": settings.threads_bcrypt or os.cpu_count() or 1,
+    }[workload]
+
+
+def get_limiter(workload: str) -> CapacityLimiter:
+    limiter = _limiters.get(workload)
+    if limiter is None:
+        limiter = _limiters[workload] = CapacityLimiter(_workload_size(workload))
+    return limiter
+
+
+async def run_sync(func: Callable[..., T], *args: Any, workload: str = "default", **kwargs: Any) -> T:
+    """Run blocking `func` on a worker thread bounded by the workload's limiter."""
+    queued = time.perf_counter()
+    started = [0.0]
+
+    def call():
+        started[0] = time.perf_counter()
+        return func(*args, **kwargs)
+
+    try:
+        return await to_thread.run_sync(call, limiter=get_limiter(workload))
+    finally:
+        if started[0]:
+            # runs back on the event loop, so no lock is needed
+            waited = started[0] - queued
+            stats = _stats.get(workload) or _stats.setdefault(workload, WorkloadStats())
+            stats.calls += 1
+            stats.wait_total += waited
+            stats.wait_max = max(stats.wait_max, waited)
+
+
+def workload_stats() -> dict[str, dict]:
+    """Per workload class: thread limit, threads busy, calls queued right now, and queue wait so far."""
+    out = {}
+    for workload, limiter in _limiters.items():
+        current = limiter.statistics()
+        stats = _stats.get(workload) or WorkloadStats()
+        out[workload] = {
+            "limit": int(current.total_tokens),
+            "busy": current.borrowed_tokens,
+            "queued": current.tasks_waiting,
+            "calls": stats.calls,
+            "wait_avg_ms": round(stats.wait_total / stats.calls * 1000, 3) if stats.calls else 0.0,
+            "wait_max_ms": round(stats.wait_max * 1000, 3),
+        }
+    return out
+
+
+@collector
+def _workload_metrics():
+    stats = {w: (limiter.statistics(), _stats.get(w) or WorkloadStats()) for w, limiter in _limiters.items()}
+    yield "workload_threads_limit", "gauge", "Thread limit per workload class", \
+        [({"workload": w}, int(cur.total_tokens)) for w, (cur, _) in stats.items()]
+    yield "workload_threads_busy", "gauge", "Threads running work per workload class", \
+        [({"workload": w}, cur.borrowed_tokens) for w, (cur, _) in stats.items()]
+    yield "workload_queued", "gauge", "Calls waiting for a thread per workload class", \
+        [({"workload": w}, cur.tasks_waiting) for w, (cur, _) in stats.items()]
+    yield "workload_calls_total", "counter", "Calls run per workload class", \
+        [({"workload": w}, st.calls) for w, (_, st) in stats.items()]
+    yield "workload_wait_seconds_total", "counter", "Time calls spent queued for a thread", \
+        [({"workload": w}, st.wait_total) for w, (_, st) in stats.items()]
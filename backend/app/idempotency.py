@@ -1,35 +1,261 @@
-from fastapi import Request
-from fastapi.responses import JSONResponse
+from fastapi import HTTPException, Request, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
 from sqlalchemy.orm import Session
-from sqlalchemy import select
-from typing import Callable, Any
+from sqlalchemy import select, update, delete, and_, or_
+from sqlalchemy.exc import IntegrityError
+from typing import Callable, Any, Iterator
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
 from functools import wraps
-import inspect
+import hashlib, inspect, threading, time, zlib
 
+import anyio
+from loguru import logger
+
+from app.config import settings
 from app.db import SessionLocal
-from app.models import IdempotencyRecord
+from app.executors import run_sync
+from app.models import IdempotencyRecord as Record
+from app.auth_cache import AuthUser
+from app.metrics import collector
+
+# Life of a key: the first request inserts a "pending" row (the unique key makes that
+# an atomic claim), runs the handler and turns the row into "done" with the response.
+# Duplicates arriving meanwhile poll until it is done; records expire after
+# IDEMPOTENCY_TTL and are purged in batches. `expires_at` doubles as the claim token:
+# a pending row past it belongs to a request that died and may be taken over.
+# Each record keeps a hash of the request it answered, so a key reused for a different
+# request (endpoint, query, body or user) is rejected instead of replaying the wrong
+# response. Responses are stored as the JSON body, zlib-compressed above
+# IDEMPOTENCY_COMPRESS_MIN bytes.
+
+# counters since start, see idempotency_stats()
+_stats = {"hits": 0, "misses": 0, "waits": 0, "conflicts": 0, "mismatches": 0}
+
+def idempotency_stats() -> dict:
+    """hits: replayed a stored response (hits_memory of them from the LRU); misses: ran the handler."""
+    return dict(_stats, hits_memory=_completed.hits, cached=len(_completed))
+
+@collector
+def _idempotency_metrics():
+    stats = idempotency_stats()
+    yield "idempotency_requests_total", "counter", "Requests with an Idempotency-Key by outcome", [
+        ({"result": "hit_memory"}, stats["hits_memory"]),
+        ({"result": "hit_db"}, max(stats["hits"] - stats["hits_memory"], 0)),
+        ({"result": "miss"}, stats["misses"]),
+        ({"result": "conflict"}, stats["conflicts"]),
+        ({"result": "mismatch"}, stats["mismatches"]),
+    ]
+    yield "idempotency_waits_total", "counter", "Duplicates that waited for the first request", [({}, stats["waits"])]
+    yield "idempotency_cached_responses", "gauge", "Responses held in the in-process LRU", [({}, stats["cached"])]
+
+class _CompletedCache:
+    """LRU of finished responses by key, so replays skip the database."""
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.hits = 0
+        self._entries: OrderedDict[str, tuple[datetime, str | None, int, bytes]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, id_key: str) -> tuple[str | None, int, bytes] | None:
+        with self._lock:
+            entry = self._entries.get(id_key)
+            if entry is None:
+                return None
+            if entry[0] < datetime.utcnow():
+                del self._entries[id_key]
+                return None
+            self._entries.move_to_end(id_key)
+            self.hits += 1
+            return entry[1:]
+
+    def put(self, id_key: str, expires_at: datetime, request_hash: str | None, status_code: int, body: bytes):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[id_key] = (expires_at, request_hash, status_code, body)
+            self._entries.move_to_end(id_key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+_completed = _CompletedCache(settings.idempotency_cache_size)
+
+@contextmanager
+def _session(db: Session | None) -> Iterator[Session]:
+    """The request's session when the endpoint has one, otherwise a short-lived one."""
+    if db is not None:
+        yield db
+        return
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+def request_fingerprint(endpoint_name: str, request: Request, body: bytes, user_id: int | None) -> str:
+    h = hashlib.sha256()
+    query = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+    for part in (endpoint_name, request.method, request.url.path, query, str(user_id or "")):
+        h.update(part.encode())
+        h.update(b"\0")
+    h.update(body)
+    return h.hexdigest()
+
+def _encode(body: bytes) -> bytes:
+    return zlib.compress(body) if len(body) >= settings.idempotency_compress_min else body
+
+def _decode(stored: bytes) -> bytes:
+    # every zlib stream starts with 0x78 ("x"), which no JSON document does
+    return zlib.decompress(stored) if stored[:1] == b"\x78" else stored
+
+def _claim(db: Session | None, id_key: str, endpoint_name: str, request_hash: str) -> tuple[str, Any]:
+    """
+    Try to become the request that runs `id_key`:
+    ("claimed", token) -> run the handler;
+    ("done", (expires_at, request_hash, status, body)) -> replay;
+    ("pending", request_hash) -> another request is running it.
+    """
+    now = datetime.utcnow()
+    token = now + timedelta(seconds=settings.idempotency_pending_timeout)
+    with _session(db) as db:
+        db.add(Record(key=id_key, endpoint=endpoint_name, request_hash=request_hash, state="pending",
+                      created_at=now, expires_at=token))
+        try:
+            db.commit()
+            return "claimed", token
+        except IntegrityError:
+            db.rollback()
+
+        row = db.execute(
+            select(Record.state, Record.request_hash, Record.status_code, Record.response_body, Record.expires_at)
+            .where(Record.key == id_key)
+        ).first()
+        db.rollback()  # end the read so the next poll sees fresh data
+        if row is None:
+            return "pending", request_hash  # purged in between; the next attempt inserts again
+        if row.expires_at is None or row.expires_at > now:
+            if row.state == "done":
+                return "done", (row.expires_at, row.request_hash, row.status_code, _decode(row.response_body))
+            return "pending", row.request_hash
 
-def with_idempotency(endpoint_name: str):
+        # expired record, or a claim whose request died: take it over unless someone else just did
+        taken = db.execute(
+            update(Record)
+            .where(Record.key == id_key, Record.expires_at == row.expires_at)
+            .values(endpoint=endpoint_name, request_hash=request_hash, state="pending", status_code=None,
+                    response_body=None, created_at=now, expires_at=token)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.commit()
+        return ("claimed", token) if taken else ("pending", request_hash)
+
+def _finish(db: Session | None, id_key: str, token: datetime, status_code: int, body: bytes) -> datetime:
+    expires_at = datetime.utcnow() + timedelta(seconds=settings.idempotency_ttl)
+    with _session(db) as db:
+        db.execute(
+            update(Record)
+            .where(Record.key == id_key, Record.state == "pending", Record.expires_at == token)
+            .values(state="done", status_code=status_code, response_body=_encode(body), expires_at=expires_at)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+    return expires_at
+
+def _release(db: Session | None, id_key: str, token: datetime):
+    """Drop our claim after the handler failed, so a retry runs it again."""
+    with _session(db) as db:
+        db.rollback()
+        db.execute(
+            delete(Record)
+            .where(Record.key == id_key, Record.state == "pending", Record.expires_at == token)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+
+def purge_expired(batch_size: int | None = None) -> int:
+    """Delete expired records in batches of `batch_size`; returns how many were removed."""
+    batch_size = batch_size or settings.idempotency_purge_batch
+    db = SessionLocal()
+    total = 0
+    try:
+        while True:
+            now = datetime.utcnow()
+            ids = db.scalars(
+                select(Record.id)
+                .where(or_(
+                    Record.expires_at < now,
+                    # records written before expiry existed
+                    and_(Record.expires_at.is_(None),
+                         Record.created_at < now - timedelta(seconds=settings.idempotency_ttl)),
+                ))
+                .limit(batch_size)
+            ).all()
+            if not ids:
+                return total
+            db.execute(delete(Record).where(Record.id.in_(ids)).execution_options(synchronize_session=False))
+            db.commit()
+            total += len(ids)
+    finally:
+        db.close()
+
+_purge_stop = threading.Event()
+_purge_thread: threading.Thread | None = None
+
+def _purge_forever():
+    while not _purge_stop.wait(settings.idempotency_purge_interval):
+        try:
+            removed = purge_expired()
+            if removed:
+                logger.info(f"Purged {removed} expired idempotency records")
+        except Exception:
+            logger.exception("Idempotency purge failed")
+
+def start_idempotency_purger():
+    global _purge_thread
+    _purge_stop.clear()
+    _purge_thread = threading.Thread(target=_purge_forever, name="idempotency-purge", daemon=True)
+    _purge_thread.start()
+
+def stop_idempotency_purger(timeout: float = 10):
+    _purge_stop.set()
+    if _purge_thread is not None:
+        _purge_thread.join(timeout)
+
+def with_idempotency(endpoint_name: str, workload: str = "default"):
     """
     Decorate endpoints so the same Idempotency-Key returns the same stored response.
     Works with both sync and async route functions that return JSON-serializable dicts.
+    Sync functions run on a worker thread of the given workload class (see app.executors),
+    as do the decorator's own DB lookups, so the event loop never blocks.
+    A duplicate that arrives while the first request is still running waits for its
+    result (up to IDEMPOTENCY_WAIT seconds, then 409).
     """
     def decorator(func: Callable[..., Any]):
         is_async = inspect.iscoroutinefunction(func)
 
+        async def call(*args, **kwargs):
+            if is_async:
+                return await func(*args, **kwargs)
+            return await run_sync(func, *args, workload=workload, **kwargs)
+
         @wraps(func)
         async def wrapper(*args, **kwargs):
-            # Try to grab Request (so we can read headers)
+            # Try to grab Request (so we can read headers), the endpoint's DB session and the caller
             request: Request | None = None
-            for v in kwargs.values():
-                if isinstance(v, Request):
+            db: Session | None = None
+            user: AuthUser | None = None
+            for v in (*kwargs.values(), *args):
+                if request is None and isinstance(v, Request):
                     request = v
-                    break
-            if request is None:
-                for v in args:
-                    if isinstance(v, Request):
-                        request = v
-                        break
+                elif db is None and isinstance(v, Session):
+                    db = v
+                elif user is None and isinstance(v, AuthUser):
+                    user = v
 
             id_key = None
             if request:
@@ -37,44 +263,66 @@ def with_idempotency(endpoint_name: str):
 
             # If no key, just run the function normally
             if not id_key:
-                if is_async:
-                    return await func(*args, **kwargs)
-                else:
-                    return func(*args, **kwargs)
+                return await call(*args, **kwargs)
+
+            request_hash = request_fingerprint(endpoint_name, request, await request.body(), user and user.id)
+
+            def check(stored_hash: str | None):
+                # records stored before fingerprints existed have none and are trusted
+                if stored_hash is not None and stored_hash != request_hash:
+                    _stats["mismatches"] += 1
+                    raise HTTPException(status_code=422,  # name differs across Starlette versions
+                                        detail="Idempotency-Key was already used for a different request")
+
+            def replay(stored_hash: str | None, status_code: int, body: bytes) -> Response:
+                check(stored_hash)
+                _stats["hits"] += 1
+                return Response(body, status_code=status_code, media_type="application/json")
+
+            cached = _completed.get(id_key)
+            if cached:
+                return replay(*cached)
 
-            db: Session = SessionLocal()
+            deadline = time.monotonic() + settings.idempotency_wait
+            waited = False
+            while True:
+                outcome, value = await run_sync(_claim, db, id_key, endpoint_name, request_hash)
+                if outcome == "claimed":
+                    token = value
+                    break
+                if outcome == "done":
+                    expires_at, stored_hash, status_code, body = value
+                    if expires_at is not None:
+                        _completed.put(id_key, expires_at, stored_hash, status_code, body)
+                    return replay(stored_hash, status_code, body)
+                check(value)
+                if not waited:
+                    _stats["waits"] += 1
+                    waited = True
+                if time.monotonic() >= deadline:
+                    _stats["conflicts"] += 1
+                    raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                                        detail="A request with this Idempotency-Key is still in progress")
+                await anyio.sleep(settings.idempotency_poll_interval)
+
+            _stats["misses"] += 1
             try:
-                # If we already have a record for this key, return it immediately
-                existing = db.scalar(select(IdempotencyRecord).where(IdempotencyRecord.key == id_key))
-                if existing:
-                    return JSONResponse(existing.response_json, status_code=existing.status_code)
-
-                # Run the endpoint (support sync/async)
-                if is_async:
-                    result = await func(*args, **kwargs)
-                else:
-                    result = func(*args, **kwargs)
-
-                # Normalize the result for storage
-                status_code = 200
-                payload: Any = result
-                # If it's a Starlette Response, don't try to store raw body; just return it.
-                if hasattr(result, "status_code") and hasattr(result, "body"):
-                    return result  # skip storing complex responses
-
-                # Store the response JSON
-                rec = IdempotencyRecord(
-                    key=id_key,
-                    endpoint=endpoint_name,
-                    status_code=status_code,
-                    response_json=payload if isinstance(payload, dict) else {"result": payload},
-                )
-                db.add(rec)
-                db.commit()
-
-                return result
-            finally:
-                db.close()
+                result = await call(*args, **kwargs)
+            except BaseException:
+                with anyio.CancelScope(shield=True):
+                    await run_sync(_release, db, id_key, token)
+                raise
+
+            # If it's a Starlette Response, don't try to store raw body; just return it.
+            if hasattr(result, "status_code") and hasattr(result, "body"):
+                await run_sync(_release, db, id_key, token)
+                return result  # skip storing complex responses
+
+            # Store the JSON body exactly as the first caller receives it
+            body = JSONResponse(jsonable_encoder(result)).body
+            expires_at = await run_sync(_finish, db, id_key, token, 200, body)
+            _completed.put(id_key, expires_at, request_hash, 200, body)
+            return result
 
         return wrapper
     return decorator
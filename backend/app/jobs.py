@@ -0,0 +1,181 @@
+from datetime import date, datetime, timedelta
+from typing import Callable
+import os, socket, threading
+
+from loguru import logger
+from sqlalchemy import select, or_, and_
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.db import SessionLocal
+from app.models import Job
+from app.metrics import timed
+from app.log import log_context
+from app.payroll import SalaryRecord, compute_month, team_member_ids, team_size
+
+# A handler processes one chunk of a job's team and returns per-employee outcomes
+# (JSON-serializable dicts) by key, e.g. {"sent": [...], "failures": [...]}: each list is
+# appended to the job's result under its key, and "failures" count toward `failed`.
+# Anything it raises fails the chunk and the job is retried.
+JobHandler = Callable[[Session, Job, list[SalaryRecord]], dict[str, list[dict]]]
+
+JOB_HANDLERS: dict[str, JobHandler] = {}
+
+_wakeup = threading.Event()
+
+
+def job_handler(kind: str):
+    def decorator(func: JobHandler) -> JobHandler:
+        JOB_HANDLERS[kind] = func
+        return func
+    return decorator
+
+
+def enqueue_job(db: Session, kind: str, manager_id: int, month: date, total: int | None = None) -> Job:
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    job = Job(
+        kind=kind,
+        manager_id=manager_id,
+        month=month.replace(day=1),
+        status="queued",
+        total=team_size(db, manager_id) if total is None else total,
+        processed=0,
+        failed=0,
+        result={},
+        attempts=0,
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    # ties the job's log lines (job_id) to the request that queued it (request_id)
+    logger.info(f"Queued job {job.id} ({kind}) for {job.total} employees")
+    _wakeup.set()
+    return job
+
+
+def job_status(job: Job) -> dict:
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "month": job.month.strftime("%Y-%m"),
+        "total": job.total,
+        "processed": job.processed,
+        "failed": job.failed,
+        "progress": round(job.processed / job.total, 4) if job.total else (1.0 if job.status == "done" else 0.0),
+        "result": job.result,
+        "error": job.error,
+        "attempts": job.attempts,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+def claim_job(db: Session, worker_id: str) -> Job | None:
+    """
+    Take the oldest queued job, or a running one whose worker stopped sending
+    heartbeats. SKIP LOCKED lets several workers poll the table concurrently.
+    """
+    stale = datetime.utcnow() - timedelta(seconds=settings.job_stale_after)
+    job = db.scalar(
+        select(Job)
+        .where(or_(Job.status == "queued", and_(Job.status == "running", Job.heartbeat_at < stale)))
+        .order_by(Job.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+    )
+    if job is None:
+        db.rollback()
+        return None
+    job.status = "running"
+    job.worker = worker_id
+    job.heartbeat_at = datetime.utcnow()
+    job.attempts += 1
+    db.commit()
+    return job
+
+
+def run_job(db: Session, job: Job):
+    """Process a claimed job chunk by chunk, committing progress after each chunk."""
+    handler = JOB_HANDLERS[job.kind]
+    try:
+        while True:
+            ids = team_member_ids(db, job.manager_id, after=job.cursor, limit=settings.job_chunk_size)
+            if not ids:
+                break
+            records = compute_month(db, job.manager_id, job.month, ids)
+            with timed(f"job.{job.kind}"):
+                outcomes = handler(db, job, records)
+
+            job.processed += len(ids)
+            job.failed += len(outcomes.get("failures", []))
+            if any(outcomes.values()):
+                job.result = {**job.result, **{key: job.result.get(key, []) + items
+                                               for key, items in outcomes.items() if items}}
+            job.cursor = ids[-1]
+            job.heartbeat_at = datetime.utcnow()
+            db.commit()
+
+        job.status = "done"
+        job.total = max(job.total, job.processed)
+        job.finished_at = datetime.utcnow()
+        db.commit()
+        logger.info(f"Job {job.id} ({job.kind}) done: {job.processed} processed, {job.failed} failed")
+    except Exception as e:
+        db.rollback()
+        logger.exception(f"Job {job.id} ({job.kind}) attempt {job.attempts} failed")
+        # progress up to the last committed chunk is kept; the next attempt resumes from there
+        job.status = "failed" if job.attempts >= settings.job_max_attempts else "queued"
+        job.error = repr(e)[:1000]
+        if job.status == "failed":
+            job.finished_at = datetime.utcnow()
+        db.commit()
+
+
+def work_once(worker_id: str) -> bool:
+    """Claim and run a single job; returns False when the queue was empty."""
+    db = SessionLocal()
+    try:
+        job = claim_job(db, worker_id)
+        if job is None:
+            return False
+        with log_context(job_id=job.id, job_kind=job.kind, manager_id=job.manager_id, sample=True):
+            run_job(db, job)
+        return True
+    finally:
+        db.close()
+
+
+def work_forever(stop: threading.Event, worker_id: str | None = None):
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+    logger.info(f"Job worker {worker_id} started")
+    while not stop.is_set():
+        try:
+            if work_once(worker_id):
+                continue
+        except Exception:
+            logger.exception("Job worker poll failed")
+        _wakeup.wait(settings.job_poll_interval)
+        _wakeup.clear()
+    logger.info(f"Job worker {worker_id} stopped")
+
+
+_stop = threading.Event()
+_threads: list[threading.Thread] = []
+
+
+def start_inprocess_workers():
+    _stop.clear()
+    for i in range(settings.job_workers):
+        t = threading.Thread(target=work_forever, args=(_stop,), name=f"job-worker-{i}", daemon=True)
+        t.start()
+        _threads.append(t)
+
+
+def stop_inprocess_workers(timeout: float = 30):
+    _stop.set()
+    _wakeup.set()
+    for t in _threads:
+        t.join(timeout)
+    _threads.clear()
@@ -0,0 +1,99 @@
+"""
+Logging setup and request context.
+
+Every log line is one JSON object (LOG_FORMAT=text for the human-readable loguru
+format) written by a background thread: the caller only formats the record and
+queues it, so a slow stderr or log shipper never stalls a request.
+
+log_context() opens a scope (a request in app.main, a job in app.jobs) whose
+fields (request_id, user_id, job_id, ...) are added to every line logged inside
+it, including from worker threads started with run_sync or the email pool.
+bind_log_context() adds fields to the current scope, e.g. the user once the
+token is decoded. A scope is sampled for tracing with probability
+TRACE_SAMPLE_RATE; inside a sampled scope every pipeline stage timed through
+app.metrics also logs a "span" line with its duration.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import timezone
+import json, random, sys, traceback
+
+from loguru import logger
+
+from app.config import settings
+
+_fields: ContextVar[dict | None] = ContextVar("log_fields", default=None)
+_sampled: ContextVar[bool] = ContextVar("log_sampled", default=False)
+
+
+@contextmanager
+def log_context(*, sample: bool = False, **fields):
+    """Scope whose `fields` go on every log line; sample=True rolls the dice for span records."""
+    fields_token = _fields.set({**(_fields.get() or {}), **fields})
+    sampled_token = _sampled.set(random.random() < settings.trace_sample_rate) if sample else None
+    try:
+        yield
+    finally:
+        if sampled_token is not None:
+            _sampled.reset(sampled_token)
+        _fields.reset(fields_token)
+
+
+def bind_log_context(**fields):
+    """Add fields to the current scope. Visible to the whole scope, even when called from a worker thread."""
+    current = _fields.get()
+    if current is None:
+        _fields.set(dict(fields))
+    else:
+        current.update(fields)
+
+
+def log_span(name: str, seconds: float, **fields):
+    if _sampled.get():
+        logger.bind(span=name, duration_ms=round(seconds * 1000, 3), **fields).info("span {} {:.1f} ms", name, seconds * 1000)
+
+
+def _add_context(record):
+    fields = _fields.get()
+    if fields:
+        record["extra"] = {**fields, **record["extra"]}
+
+
+def _json_format(record) -> str:
+    entry = {
+        "ts": record["time"].astimezone(timezone.utc).isoformat(timespec="milliseconds"),
+        "level": record["level"].name,
+        "msg": record["message"],
+        "logger": record["name"],
+        "line": record["line"],
+        **{k: v for k, v in record["extra"].items() if not k.startswith("_")},
+    }
+    if record["exception"] is not None:
+        entry["exception"] = "".join(traceback.format_exception(*record["exception"])).rstrip()
+    record["extra"]["_json"] = json.dumps(entry, default=str)
+    return "{extra[_json]}\n"
+
+
+def _text_format(record) -> str:
+    context = " ".join(f"{k}={v}" for k, v in record["extra"].items() if not k.startswith("_"))
+    record["extra"]["_context"] = f" [{context}]" if context else ""
+    return ("<green>{time:YYYY-MM-DD HH:mm:ss.SSS}</green> | <level>{level: <8}</level> | "
+            "<cyan>{name}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>{extra[_context]}\n{exception}")
+
+
+def configure_logging():
+    """Replace loguru's default stderr handler with the queued one configured by LOG_FORMAT / LOG_LEVEL."""
+    logger.remove()
+    logger.configure(patcher=_add_context)
+    logger.add(
+        sys.stderr,
+        level=settings.log_level.upper(),
+        format=_text_format if settings.log_format == "text" else _json_format,
+        colorize=settings.log_format == "text" and sys.stderr.isatty(),
+        enqueue=True,  # formatted in the caller, written by loguru's worker thread
+        backtrace=False,
+        diagnose=False,  # no local variables (tokens, CNPs) in tracebacks
+    )
+    if settings.log_file:
+        logger.add(settings.log_file, level=settings.log_level.upper(), format=_json_format,
+                   enqueue=True, backtrace=False, diagnose=False, rotation="100 MB", retention=10)
@@ -1,7 +1,7 @@
 from fastapi import FastAPI, Request, Response
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-import os, uuid
+import re, time, uuid
 from loguru import logger
 
 from app.config import settings
@@ -9,6 +9,18 @@ from app.routers_auth import router as auth_router, manager_router as manager_ro
 from app.routers_reports import router as reports_router
 from app.routers_pdfs import router as pdfs_router
 from app.routers_archives import router as archives_router
+from app.routers_jobs import router as jobs_router
+from app.routers_files import router as files_router
+from app.jobs import start_inprocess_workers, stop_inprocess_workers
+from app.idempotency import start_idempotency_purger, stop_idempotency_purger
+from app.slips import shutdown_render_pool
+from app.emailer import close_mail_pool
+from app.db import pool_stats
+from app.executors import workload_stats
+from app.metrics import REQUEST_SECONDS, render as render_metrics
+from app.log import configure_logging, log_context
+
+configure_logging()
 
 app = FastAPI(title="Slip Salary API", version="1.0.0")
 
@@ -21,16 +33,32 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Simple request logging + correlation id
+_REQUEST_ID = re.compile(r"[\w.:-]{1,64}")
+
+# Request log line, latency metric and correlation id. Everything logged while the
+# request runs carries request_id, and user_id once the token is decoded (see app.log).
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
-    correlation_id = request.headers.get("X-Request-ID") or str(uuid.uuid4())
-    idempotency_key = request.headers.get("Idempotency-Key")
-    who = "anon"
-    if (auth := request.headers.get("Authorization", "")) and auth.lower().startswith("bearer "):
-        who = "bearer"
-    logger.info(f"[{correlation_id}] {request.method} {request.url.path} Idem={idempotency_key} User={who}")
-    response: Response = await call_next(request)
+    correlation_id = request.headers.get("X-Request-ID", "")
+    if not _REQUEST_ID.fullmatch(correlation_id):
+        correlation_id = uuid.uuid4().hex
+    with log_context(request_id=correlation_id, sample=True):
+        started = time.perf_counter()
+        status_code = 500
+        try:
+            response: Response = await call_next(request)
+            status_code = response.status_code
+        finally:
+            elapsed = time.perf_counter() - started
+            # by route template (/files/{path:path}), not raw path, so the label set stays small;
+            # streamed bodies are timed up to the first byte
+            route = request.scope.get("route")
+            route_path = route.path if route else "unmatched"
+            REQUEST_SECONDS.observe(elapsed, method=request.method, route=route_path, status=status_code)
+            logger.bind(
+                method=request.method, path=request.url.path, route=route_path, status=status_code,
+                duration_ms=round(elapsed * 1000, 3), idempotency_key=request.headers.get("Idempotency-Key"),
+            ).info("{} {} {}", request.method, request.url.path, status_code)
     response.headers["X-Request-ID"] = correlation_id
     return response
 
@@ -40,12 +68,28 @@ app.include_router(manager_router)   # /manager/ping
 app.include_router(reports_router)   # CSV create/send
 app.include_router(pdfs_router)      # PDF create/send
 app.include_router(archives_router)  # list archives
+app.include_router(jobs_router)      # background job status
+app.include_router(files_router)     # generated files (CSV/PDF/archives) under /files
+
+@app.on_event("startup")
+def start_job_workers():
+    if settings.job_worker_mode == "inprocess":
+        start_inprocess_workers()
+    start_idempotency_purger()
+
+@app.on_event("shutdown")
+def stop_worker_pools():
+    stop_inprocess_workers()
+    stop_idempotency_purger()
+    shutdown_render_pool()
+    close_mail_pool()
+    logger.complete()  # flush queued log lines
 
-# Serve generated files (CSV/PDF/archives)
-BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
-STORAGE_DIR = os.path.join(BASE_DIR, "storage")
-os.makedirs(STORAGE_DIR, exist_ok=True)
-app.mount("/files", StaticFiles(directory=STORAGE_DIR), name="files")
+@app.on_event("shutdown")
+async def dispose_async_engine():
+    if settings.db_async:
+        from app.db_async import async_engine
+        await async_engine.dispose()
 
 @app.get("/health")
 def health():
@@ -54,3 +98,18 @@ def health():
         "env": getattr(settings, "app_env", "dev"),
         "smtp": f"{getattr(settings, 'smtp_host', 'localhost')}:{getattr(settings, 'smtp_port', 1025)}",
     }
+
+@app.get("/health/db")
+def health_db():
+    """Connection pool occupancy and checkout wait times, for sizing DB_POOL_SIZE."""
+    return pool_stats()
+
+@app.get("/health/executors")
+async def health_executors():
+    """Thread limits, busy threads, queue depth and queue wait per workload class (see app.executors)."""
+    return workload_stats()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus text exposition of this process's metrics (see app.metrics)."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,124 @@
+"""
+In-process metrics in the Prometheus text format, served at /metrics.
+
+Histograms are recorded where the work happens: request latency by route (the
+middleware in app.main) and the pipeline stages via timed("stage"), which also
+feeds the sampled span records of app.log. Values that other modules already
+keep (DB pool, worker threads, caches, idempotency) are read when /metrics is
+scraped, through functions registered with @collector.
+Each API process keeps its own numbers, so scrape every worker.
+"""
+from contextlib import ContextDecorator
+from typing import Callable, Iterable
+import threading, time
+
+from app.log import log_span
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# (name, type, help, [(labels, value), ...]) as produced by a collector
+Family = tuple[str, str, str, list[tuple[dict, float]]]
+
+_histograms: list["Histogram"] = []
+_collectors: list[Callable[[], Iterable[Family]]] = []
+
+
+def _escape(value: object) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(pairs: Iterable[tuple[str, object]]) -> str:
+    text = ",".join(f'{k}="{_escape(v)}"' for k, v in pairs)
+    return "{" + text + "}" if text else ""
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Cumulative histogram with a fixed label set; safe to observe from any thread."""
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._series: dict[tuple, list] = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+        _histograms.append(self)
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(key, list(series)) for key, series in self._series.items()]
+        for key, series in sorted(items):
+            base = list(zip(self.labelnames, key))
+            for bound, count in zip(self.buckets, series):
+                lines.append(f"{self.name}_bucket{_labels(base + [('le', bound)])} {count}")
+            lines.append(f"{self.name}_bucket{_labels(base + [('le', '+Inf')])} {series[-1]}")
+            lines.append(f"{self.name}_sum{_labels(base)} {series[-2]!r}")
+            lines.append(f"{self.name}_count{_labels(base)} {series[-1]}")
+        return lines
+
+
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template",
+    ("method", "route", "status"),
+)
+STAGE_SECONDS = Histogram(
+    "slip_stage_duration_seconds", "Time spent in payroll, PDF, email and archive pipeline stages",
+    ("stage",),
+)
+
+
+class timed(ContextDecorator):
+    """Record the duration of a block or function call under STAGE_SECONDS{stage=...}."""
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self._starts = threading.local()
+
+    def __enter__(self):
+        self._starts.__dict__.setdefault("stack", []).append(time.perf_counter())
+        return self
+
+    def __exit__(self, *exc):
+        observe_stage(self.stage, time.perf_counter() - self._starts.stack.pop())
+        return False
+
+
+def observe_stage(stage: str, seconds: float):
+    """Record a stage duration; inside a sampled request or job it is also logged as a span."""
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    log_span(stage, seconds)
+
+
+def collector(fn: Callable[[], Iterable[Family]]):
+    """Register a function whose metric families are read at scrape time."""
+    _collectors.append(fn)
+    return fn
+
+
+def render() -> str:
+    lines: list[str] = []
+    for histogram in _histograms:
+        lines += histogram.render()
+    for fn in _collectors:
+        for name, kind, help, samples in fn():
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+            lines += [f"{name}{_labels(labels.items())} {_number(value)}" for labels, value in samples]
+    return "\n".join(lines) + "\n"
@@ -1,5 +1,5 @@
 from datetime import date
-from sqlalchemy import String, Integer, Date, ForeignKey, Numeric, Enum, UniqueConstraint
+from sqlalchemy import String, Integer, Date, ForeignKey, Numeric, Enum, UniqueConstraint, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 import enum
 
@@ -37,45 +37,59 @@ class User(Base):
     vacations: Mapped[list["Vacation"]] = relationship(back_populates="user", cascade="all, delete-orphan")
     bonuses: Mapped[list["Bonus"]] = relationship(back_populates="user", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # team lookups: role = employee AND manager_id = ?, paged by id
+        Index("ix_users_role_manager_id", "role", "manager_id", "id"),
+    )
+
 class Employment(Base):
     __tablename__ = "employment"
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), unique=True, nullable=False)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), unique=True, nullable=False, active_history=True)
     hire_date: Mapped[date] = mapped_column(Date, nullable=False)
     end_date: Mapped[date | None] = mapped_column(Date, nullable=True)
     base_salary: Mapped[float] = mapped_column(Numeric(12,2), nullable=False, default=0)
 
     user: Mapped["User"] = relationship(back_populates="employment")
 
+# active_history on the columns that place a row in a (user, month): changing one on an
+# expired object loads the old value first, so app.payroll can mark that month stale too.
 class Vacation(Base):
     __tablename__ = "vacations"
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
-    start_date: Mapped[date] = mapped_column(Date, nullable=False)
-    end_date: Mapped[date] = mapped_column(Date, nullable=False)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False, active_history=True)
+    start_date: Mapped[date] = mapped_column(Date, nullable=False, active_history=True)
+    end_date: Mapped[date] = mapped_column(Date, nullable=False, active_history=True)
     days: Mapped[int] = mapped_column(Integer, nullable=False)
 
     user: Mapped["User"] = relationship(back_populates="vacations")
 
     __table_args__ = (
         UniqueConstraint("user_id", "start_date", "end_date", name="uq_vacation_span"),
+        # spans overlapping a month: user_id = ? AND end_date >= ? AND start_date <= ?
+        Index("ix_vacations_user_end_start", "user_id", "end_date", "start_date"),
     )
 
 class Bonus(Base):
     __tablename__ = "bonuses"
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
-    bonus_date: Mapped[date] = mapped_column(Date, nullable=False)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False, active_history=True)
+    bonus_date: Mapped[date] = mapped_column(Date, nullable=False, active_history=True)
     amount: Mapped[float] = mapped_column(Numeric(12,2), nullable=False)
     reason: Mapped[str] = mapped_column(String(255), nullable=True)
 
     user: Mapped["User"] = relationship(back_populates="bonuses")
 
+    __table_args__ = (
+        # monthly totals read amount straight from the index on Postgres
+        Index("ix_bonuses_user_date", "user_id", "bonus_date", postgresql_include=["amount"]),
+    )
+
 class WorkLog(Base):
     __tablename__ = "work_logs"
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
-    work_date: Mapped[date] = mapped_column(Date, nullable=False)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False, active_history=True)
+    work_date: Mapped[date] = mapped_column(Date, nullable=False, active_history=True)
     hours: Mapped[float] = mapped_column(Numeric(4,2), nullable=False, default=8)
     note: Mapped[str | None] = mapped_column(String(255), nullable=True)
 
@@ -85,14 +99,90 @@ class WorkLog(Base):
         UniqueConstraint("user_id", "work_date", name="uq_worklog_user_date"),
     )
 
-from sqlalchemy import JSON, DateTime
+from sqlalchemy import JSON, DateTime, LargeBinary, BigInteger
 from datetime import datetime
 
+class PayrollMonthSummary(Base):
+    """
+    Precomputed payroll figures per employee and month, read by the reports instead
+    of re-aggregating the raw tables. Any write to work logs, bonuses, vacations or
+    employment bumps `version` (see app.payroll); a row is current while
+    `computed_version` equals it.
+    """
+    __tablename__ = "payroll_month_summary"
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    month: Mapped[date] = mapped_column(Date, primary_key=True)  # first day of the month
+    base_salary: Mapped[float] = mapped_column(Numeric(12,2), nullable=False, default=0)
+    working_days: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    vacation_days: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    bonus_total: Mapped[float] = mapped_column(Numeric(12,2), nullable=False, default=0)
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    computed_version: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    refreshed_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+
+class ArchiveEntry(Base):
+    """
+    A file in the archive: the logical name it is published under
+    (storage/archive/{kind}/{name}) and the content blob it points to (see app.archive_store).
+    """
+    __tablename__ = "archive_entries"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    kind: Mapped[str] = mapped_column(String(10), nullable=False)  # "pdf" / "csv"
+    name: Mapped[str] = mapped_column(String(255), nullable=False)
+    sha256: Mapped[str] = mapped_column(String(64), nullable=False, index=True)
+    crc32: Mapped[int | None] = mapped_column(BigInteger, nullable=True)  # for ZIP packs; unsigned 32-bit
+    size_bytes: Mapped[int] = mapped_column(Integer, nullable=False)
+    manager_id: Mapped[int | None] = mapped_column(ForeignKey("users.id"), nullable=True)
+    user_id: Mapped[int | None] = mapped_column(ForeignKey("users.id"), nullable=True)  # employee, for slips
+    month: Mapped[date | None] = mapped_column(Date, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("kind", "name", name="uq_archive_entries_kind_name"),
+        # /archives pages: newest first per manager (or employee) and kind
+        Index("ix_archive_entries_manager_kind_id", "manager_id", "kind", "id"),
+        Index("ix_archive_entries_user_kind_id", "user_id", "kind", "id"),
+    )
+
 class IdempotencyRecord(Base):
     __tablename__ = "idempotency_records"
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     key: Mapped[str] = mapped_column(String(128), unique=True, nullable=False)
     endpoint: Mapped[str] = mapped_column(String(255), nullable=False)
-    status_code: Mapped[int] = mapped_column(Integer, nullable=False)
-    response_json: Mapped[dict] = mapped_column(JSON, nullable=False, default=dict)
+    # sha256 of endpoint, method, path, query, body and caller (see app.idempotency)
+    request_hash: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    # "pending" while the first request runs, "done" once the response is stored
+    state: Mapped[str] = mapped_column(String(20), nullable=False, default="done")
+    status_code: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    # JSON response body, zlib-compressed when large
+    response_body: Mapped[bytes | None] = mapped_column(LargeBinary, nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow)
+    expires_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True, index=True)
+
+class Job(Base):
+    """
+    Background payroll job (PDF generation / sending). Workers process the team in
+    chunks ordered by user id and persist `cursor` after each one, so a job picked
+    up again after a crash resumes where it stopped.
+    """
+    __tablename__ = "jobs"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    kind: Mapped[str] = mapped_column(String(50), nullable=False)
+    manager_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
+    month: Mapped[date] = mapped_column(Date, nullable=False)
+    status: Mapped[str] = mapped_column(String(20), nullable=False, default="queued")  # queued/running/done/failed
+    total: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    processed: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    failed: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    cursor: Mapped[int | None] = mapped_column(Integer, nullable=True)  # last user id processed
+    result: Mapped[dict] = mapped_column(JSON, nullable=False, default=dict)
+    error: Mapped[str | None] = mapped_column(String(1000), nullable=True)
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    worker: Mapped[str | None] = mapped_column(String(255), nullable=True)
+    heartbeat_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow)
+    finished_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_jobs_status_id", "status", "id"),
+    )
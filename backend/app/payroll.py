@@ -0,0 +1,346 @@
+from datetime import date, datetime, timedelta
+from typing import Iterator
+import calendar
+
+from loguru import logger
+from sqlalchemy import select, func, and_, or_, update, bindparam, inspect
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.db import upsert_insert
+from app.metrics import timed
+from app.models import User, UserRole as ModelRole, WorkLog, Vacation, Bonus, Employment, PayrollMonthSummary
+from app.workdays import overlap_business_days_many
+
+
+class SalaryRecord:
+    """One employee's payroll figures for a month, as consumed by the CSV and PDF pipelines."""
+    __slots__ = (
+        "user_id", "first_name", "last_name", "email", "employee_code", "cnp",
+        "base_salary", "working_days", "vacation_days", "bonus_total",
+    )
+
+    def __init__(self, user_id: int, first_name: str, last_name: str, email: str,
+                 employee_code: str, cnp: str, base_salary: float, working_days: int,
+                 vacation_days: int, bonus_total: float):
+        self.user_id = user_id
+        self.first_name = first_name
+        self.last_name = last_name
+        self.email = email
+        self.employee_code = employee_code
+        self.cnp = cnp
+        self.base_salary = base_salary
+        self.working_days = working_days
+        self.vacation_days = vacation_days
+        self.bonus_total = bonus_total
+
+    @property
+    def full_name(self) -> str:
+        return f"{self.first_name} {self.last_name}"
+
+    @property
+    def total_salary(self) -> float:
+        return round(self.base_salary + self.bonus_total, 2)
+
+    def __repr__(self) -> str:
+        return f"SalaryRecord(user_id={self.user_id}, total_salary={self.total_salary:.2f})"
+
+
+def month_bounds(d: date):
+    first = d.replace(day=1)
+    last = d.replace(day=calendar.monthrange(d.year, d.month)[1])
+    return first, last
+
+
+def _team_filter(manager_id: int, user_ids: list[int] | None = None):
+    cond = and_(User.role == ModelRole.employee, User.manager_id == manager_id)
+    if user_ids is not None:
+        cond = and_(cond, User.id.in_(user_ids))
+    return cond
+
+
+def team_size(db: Session, manager_id: int) -> int:
+    return db.scalar(select(func.count(User.id)).where(_team_filter(manager_id))) or 0
+
+
+def team_member_ids(db: Session, manager_id: int, after: int | None = None, limit: int | None = None) -> list[int]:
+    """Team member ids in id order; `after`/`limit` page through them (keyset)."""
+    stmt = select(User.id).where(_team_filter(manager_id)).order_by(User.id).limit(limit)
+    if after is not None:
+        stmt = stmt.where(User.id > after)
+    return list(db.scalars(stmt))
+
+
+def _team_rows_stmt(manager_id: int, month_start: date, month_end: date, user_ids: list[int] | None = None):
+    team = select(User.id).where(_team_filter(manager_id, user_ids))
+
+    work_sq = (
+        select(WorkLog.user_id, func.count(WorkLog.id).label("working_days"))
+        .where(WorkLog.user_id.in_(team))
+        .where(WorkLog.work_date >= month_start, WorkLog.work_date <= month_end)
+        .group_by(WorkLog.user_id)
+        .subquery()
+    )
+    bonus_sq = (
+        select(Bonus.user_id, func.sum(Bonus.amount).label("bonus_total"))
+        .where(Bonus.user_id.in_(team))
+        .where(Bonus.bonus_date >= month_start, Bonus.bonus_date <= month_end)
+        .group_by(Bonus.user_id)
+        .subquery()
+    )
+
+    return (
+        select(
+            User.id,
+            User.first_name,
+            User.last_name,
+            User.email,
+            User.employee_code,
+            User.cnp,
+            func.coalesce(Employment.base_salary, 0),
+            func.coalesce(work_sq.c.working_days, 0),
+            func.coalesce(bonus_sq.c.bonus_total, 0),
+        )
+        .outerjoin(Employment, Employment.user_id == User.id)
+        .outerjoin(work_sq, work_sq.c.user_id == User.id)
+        .outerjoin(bonus_sq, bonus_sq.c.user_id == User.id)
+        .where(_team_filter(manager_id, user_ids))
+        .order_by(User.last_name, User.first_name, User.id)
+    )
+
+
+def _vacation_days(db: Session, team, month_start: date, month_end: date) -> dict[int, int]:
+    """Business days of vacation inside the month per user; `team` is a list of ids or an id subquery."""
+    days: dict[int, int] = {}
+    rows = db.execute(
+        select(Vacation.user_id, Vacation.start_date, Vacation.end_date)
+        .where(Vacation.user_id.in_(team))
+        .where(Vacation.end_date >= month_start, Vacation.start_date <= month_end)
+    ).all()
+    counts = overlap_business_days_many([(start, end) for _, start, end in rows], month_start, month_end)
+    for (user_id, _, _), n in zip(rows, counts):
+        days[user_id] = days.get(user_id, 0) + n
+    return days
+
+
+def _to_records(rows, vacation_days: dict[int, int]) -> list[SalaryRecord]:
+    return [
+        SalaryRecord(
+            user_id, first_name, last_name, email, employee_code, cnp,
+            float(base_salary), int(working_days), vacation_days.get(user_id, 0), float(bonus_total),
+        )
+        for (user_id, first_name, last_name, email, employee_code, cnp,
+             base_salary, working_days, bonus_total) in rows
+    ]
+
+
+def aggregate_team(db: Session, manager_id: int, month_start: date, month_end: date,
+                   user_ids: list[int] | None = None) -> list[SalaryRecord]:
+    """
+    Compute base salary, working days, vacation days and bonus totals for every
+    employee of a manager (or only `user_ids` among them). Runs two queries no
+    matter how large the team is: one grouped query for employment/work logs/bonuses
+    and one for the vacation spans overlapping the month.
+    """
+    team_rows = db.execute(_team_rows_stmt(manager_id, month_start, month_end, user_ids)).all()
+    if not team_rows:
+        return []
+    team = select(User.id).where(_team_filter(manager_id, user_ids))
+    return _to_records(team_rows, _vacation_days(db, team, month_start, month_end))
+
+
+# ---------- Monthly summary (payroll_month_summary) ----------
+# Reports read precomputed rows; track_payroll_changes, an after_flush hook on every
+# Session (registered in app.db), bumps `version` for every (user, month) a write to
+# the raw tables can affect, in the writer's own transaction.
+# Refreshes only store their figures if `version` is still the one they saw, so a
+# change committed while they were aggregating is never hidden behind old numbers.
+# Writes that bypass the ORM (bulk SQL, manual fixes) need refresh_month afterwards.
+
+def _month_starts(start: date, end: date) -> Iterator[date]:
+    cur = start.replace(day=1)
+    while cur <= end:
+        yield cur
+        cur = (cur + timedelta(days=32)).replace(day=1)
+
+
+def mark_stale(conn, keys: set[tuple[int, date]]):
+    """Invalidate the summaries of these (user_id, month start) pairs, creating placeholders if needed."""
+    if not keys:
+        return
+    stmt = upsert_insert(conn, PayrollMonthSummary).on_conflict_do_update(
+        index_elements=["user_id", "month"],
+        set_={"version": PayrollMonthSummary.version + 1},
+    )
+    conn.execute(stmt, [dict(user_id=u, month=m, version=1) for u, m in sorted(keys)])
+
+
+def _values(obj, name: str) -> list:
+    """
+    Current value of an attribute plus, for a modified object, the value it replaced
+    (always known: the columns read here have active_history, see app.models).
+    """
+    values = [getattr(obj, name)]
+    history = inspect(obj).attrs[name].history
+    values += [v for v in history.deleted if v is not None and v not in values]
+    return values
+
+
+def track_payroll_changes(session: Session):
+    """Bump the version of every summary the objects just flushed can affect."""
+    keys: set[tuple[int, date]] = set()
+    salary_users: set[int] = set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, WorkLog):
+            keys |= {(u, d.replace(day=1)) for u in _values(obj, "user_id") for d in _values(obj, "work_date")}
+        elif isinstance(obj, Bonus):
+            keys |= {(u, d.replace(day=1)) for u in _values(obj, "user_id") for d in _values(obj, "bonus_date")}
+        elif isinstance(obj, Vacation):
+            for u in _values(obj, "user_id"):
+                for start in _values(obj, "start_date"):
+                    for end in _values(obj, "end_date"):
+                        keys |= {(u, m) for m in _month_starts(start, end)}
+        elif isinstance(obj, Employment):
+            salary_users.update(_values(obj, "user_id"))
+    if not keys and not salary_users:
+        return
+    conn = session.connection()
+    mark_stale(conn, keys)
+    if salary_users:
+        # base salary applies to every month already summarised; missing months are computed on read
+        conn.execute(
+            update(PayrollMonthSummary)
+            .where(PayrollMonthSummary.user_id.in_(salary_users))
+            .values(version=PayrollMonthSummary.version + 1)
+        )
+
+
+def _summary_stmt(manager_id: int, month_start: date, user_ids: list[int] | None = None):
+    S = PayrollMonthSummary
+    return (
+        select(
+            User.id, User.first_name, User.last_name, User.email, User.employee_code, User.cnp,
+            S.base_salary, S.working_days, S.vacation_days, S.bonus_total, S.version, S.computed_version,
+        )
+        .outerjoin(S, and_(S.user_id == User.id, S.month == month_start))
+        .where(_team_filter(manager_id, user_ids))
+        .order_by(User.last_name, User.first_name, User.id)
+    )
+
+
+def _is_stale(row) -> bool:
+    return row.version is None or row.computed_version != row.version
+
+
+def _summary_record(row) -> SalaryRecord:
+    return SalaryRecord(
+        row.id, row.first_name, row.last_name, row.email, row.employee_code, row.cnp,
+        float(row.base_salary), row.working_days, row.vacation_days, float(row.bonus_total),
+    )
+
+
+@timed("payroll.refresh")
+def refresh_summaries(db: Session, manager_id: int, month: date,
+                      seen: dict[int, int | None]) -> dict[int, SalaryRecord]:
+    """
+    Recompute the summaries of `seen` (user_id -> version read, None if the row is
+    missing) and commit. Returns the fresh records by user id.
+    """
+    month_start, month_end = month_bounds(month)
+    records = aggregate_team(db, manager_id, month_start, month_end, list(seen))
+    now = datetime.utcnow()
+    conn = db.connection()
+    created, updated = [], []
+    for rec in records:
+        figures = dict(base_salary=rec.base_salary, working_days=rec.working_days,
+                       vacation_days=rec.vacation_days, bonus_total=rec.bonus_total, refreshed_at=now)
+        version = seen[rec.user_id]
+        if version is None:
+            created.append(dict(user_id=rec.user_id, month=month_start, version=0, computed_version=0, **figures))
+        else:
+            updated.append(dict(b_user_id=rec.user_id, b_version=version, computed_version=version, **figures))
+    if created:
+        stmt = upsert_insert(conn, PayrollMonthSummary).on_conflict_do_nothing(index_elements=["user_id", "month"])
+        conn.execute(stmt, created)
+    if updated:
+        table = PayrollMonthSummary.__table__
+        conn.execute(
+            update(table)
+            .where(table.c.user_id == bindparam("b_user_id"), table.c.month == month_start,
+                   table.c.version == bindparam("b_version")),
+            updated,
+        )
+    db.commit()
+    logger.debug("Refreshed {} payroll summaries ({} new) for manager {} {:%Y-%m}",
+                 len(records), len(created), manager_id, month_start)
+    return {rec.user_id: rec for rec in records}
+
+
+def refresh_month(db: Session, month: date, manager_id: int | None = None) -> int:
+    """Recompute a whole month (for one manager's team, or everyone); returns the number of employees."""
+    month_start, _ = month_bounds(month)
+    if manager_id is not None:
+        managers = [manager_id]
+    else:
+        managers = db.scalars(
+            select(User.manager_id).where(User.role == ModelRole.employee, User.manager_id.is_not(None)).distinct()
+        ).all()
+    count = 0
+    for mid in managers:
+        mark_stale(db.connection(), {(uid, month_start) for uid in team_member_ids(db, mid)})
+        db.commit()
+        count += len(compute_month(db, mid, month))
+    logger.info("Recomputed payroll {:%Y-%m} for {} employees of {} managers", month_start, count, len(managers))
+    return count
+
+
+def iter_team(db: Session, manager_id: int, month: date, chunk_size: int = 500) -> Iterator[list[SalaryRecord]]:
+    """
+    Same figures as compute_month, but streamed through a server-side cursor
+    `chunk_size` rows at a time, so memory does not grow with the team. With the
+    summary enabled, stale rows are refreshed first and the stream reads the
+    summary; otherwise each chunk is aggregated from the raw tables.
+    """
+    month_start, month_end = month_bounds(month)
+    if settings.payroll_summary:
+        while True:
+            rows = db.execute(_summary_stmt(manager_id, month_start).where(or_(
+                PayrollMonthSummary.version.is_(None),
+                PayrollMonthSummary.computed_version.is_(None),
+                PayrollMonthSummary.computed_version != PayrollMonthSummary.version,
+            )).limit(chunk_size)).all()
+            if not rows:
+                break
+            refresh_summaries(db, manager_id, month, {row.id: row.version for row in rows})
+        stmt = _summary_stmt(manager_id, month_start)
+    else:
+        stmt = _team_rows_stmt(manager_id, month_start, month_end)
+
+    result = db.execute(stmt.execution_options(yield_per=chunk_size))
+    try:
+        for rows in result.partitions():
+            if settings.payroll_summary:
+                yield [_summary_record(row) for row in rows]
+            else:
+                ids = [row[0] for row in rows]
+                yield _to_records(rows, _vacation_days(db, ids, month_start, month_end))
+    finally:
+        result.close()
+
+
+@timed("payroll.compute")
+def compute_month(db: Session, manager_id: int, month: date,
+                  user_ids: list[int] | None = None) -> list[SalaryRecord]:
+    """
+    Payroll for a manager's team (or `user_ids` among them) for the month containing
+    `month`. Reads payroll_month_summary in one query and recomputes only the rows
+    that are missing or stale (PAYROLL_SUMMARY=false aggregates the raw tables).
+    """
+    month_start, month_end = month_bounds(month)
+    if not settings.payroll_summary:
+        return aggregate_team(db, manager_id, month_start, month_end, user_ids)
+
+    rows = db.execute(_summary_stmt(manager_id, month_start, user_ids)).all()
+    seen = {row.id: row.version for row in rows if _is_stale(row)}
+    fresh = refresh_summaries(db, manager_id, month, seen) if seen else {}
+    return [fresh[row.id] if row.id in fresh else _summary_record(row) for row in rows]
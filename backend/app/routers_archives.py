@@ -1,68 +1,173 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy import select, Select
 from sqlalchemy.orm import Session
-import os, time
+from datetime import datetime, timezone
+from email.utils import format_datetime
+import hashlib, json
 
-from app.db import SessionLocal
+from app.config import settings
+from app.deps import get_db
+from app.models import ArchiveEntry
+from app.archive_store import ARCHIVE_KINDS, blob_path, file_digests
+from app.archive_pack import PackMember, PackTooLarge, ZipPack, parse_range
+from app.auth_cache import AuthUser
 from app.routers_auth import require_manager
 
 router = APIRouter(tags=["archives"])
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-BASE = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
-ARCHIVE_CSV = os.path.join(BASE, "storage", "archive", "csv")
-ARCHIVE_PDF = os.path.join(BASE, "storage", "archive", "pdf")
-
-def list_dir(dirpath: str, base_url: str):
-    os.makedirs(dirpath, exist_ok=True)
-    items = []
-    for name in sorted(os.listdir(dirpath), reverse=True):
-        path = os.path.join(dirpath, name)
-        if not os.path.isfile(path):
-            continue
-        st = os.stat(path)
-        items.append({
-            "name": name,
-            "size_bytes": st.st_size,
-            "modified": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(st.st_mtime)),
-            "url": f"{base_url}/{name}",
-        })
-    return items
-
-@router.get("/archives")
-def list_archives(_: str = Depends(require_manager), db: Session = Depends(get_db)):
+# The listing reads the archive_entries catalog (written when a file is archived,
+# see app.archive_store), newest first, one page per kind. `next` holds the cursor
+# for the following page of each kind: pass it back as ?kind=...&cursor=...
+
+class ArchiveFilters:
+    def __init__(
+        self,
+        kind: str | None = Query(None, pattern="^(pdf|csv)$"),
+        employee_id: int | None = None,
+        month: str | None = Query(None, pattern=r"^\d{4}-\d{2}$", description="YYYY-MM"),
+        cursor: int | None = None,
+        limit: int = Query(50, ge=1, le=500),
+    ):
+        if cursor is not None and kind is None:
+            raise HTTPException(status_code=400, detail="cursor needs kind")
+        self.kinds = (kind,) if kind else ARCHIVE_KINDS
+        self.employee_id = employee_id
+        self.month = datetime.strptime(month, "%Y-%m").date() if month else None
+        self.cursor = cursor
+        self.limit = limit
+
+def archive_page_stmt(manager_id: int, kind: str, f: ArchiveFilters) -> Select:
+    stmt = (
+        select(ArchiveEntry.id, ArchiveEntry.name, ArchiveEntry.size_bytes, ArchiveEntry.created_at)
+        .where(ArchiveEntry.manager_id == manager_id, ArchiveEntry.kind == kind)
+    )
+    if f.employee_id is not None:
+        stmt = stmt.where(ArchiveEntry.user_id == f.employee_id)
+    if f.month is not None:
+        stmt = stmt.where(ArchiveEntry.month == f.month)
+    if f.cursor is not None:
+        stmt = stmt.where(ArchiveEntry.id < f.cursor)
+    # one extra row tells whether there is a next page
+    return stmt.order_by(ArchiveEntry.id.desc()).limit(f.limit + 1)
+
+def page_items(kind: str, rows, limit: int) -> tuple[list[dict], int | None]:
+    items = [
+        {
+            "name": row.name,
+            "size_bytes": row.size_bytes,
+            "modified": row.created_at.strftime("%Y-%m-%d %H:%M:%S"),
+            "url": f"/files/archive/{kind}/{row.name}",
+        }
+        for row in rows[:limit]
+    ]
+    return items, (rows[limit - 1].id if len(rows) > limit else None)
+
+def catalog_response(request: Request, pages: dict[str, tuple[list[dict], int | None]]) -> Response:
+    body = {kind: items for kind, (items, _) in pages.items()}
+    body["next"] = {kind: cursor for kind, (_, cursor) in pages.items()}
+    content = json.dumps(body, separators=(",", ":")).encode()
+    etag = '"' + hashlib.sha256(content).hexdigest()[:32] + '"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag in request.headers.get("If-None-Match", ""):
+        return Response(status_code=304, headers=headers)
+    return Response(content, media_type="application/json", headers=headers)
+
+def load_catalog(db: Session, manager_id: int, f: ArchiveFilters) -> dict[str, tuple[list[dict], int | None]]:
     return {
-        "csv": list_dir(ARCHIVE_CSV, "/files/archive/csv"),
-        "pdf": list_dir(ARCHIVE_PDF, "/files/archive/pdf"),
+        kind: page_items(kind, db.execute(archive_page_stmt(manager_id, kind, f)).all(), f.limit)
+        for kind in f.kinds
     }
 
-from fastapi.responses import HTMLResponse
+if settings.db_async:
+    from sqlalchemy.ext.asyncio import AsyncSession
+    from app.db_async import get_async_db, require_manager_async
 
-@router.get("/archives/browse", response_class=HTMLResponse)
-def browse_archives(_: str = Depends(require_manager)):
-    # Very simple HTML list using the same listing helpers
-    data = {
-        "csv": list_dir(ARCHIVE_CSV, "/files/archive/csv"),
-        "pdf": list_dir(ARCHIVE_PDF, "/files/archive/pdf"),
-    }
-    def li(items):
-        return "\n".join(
-            f'<li><a href="{f["url"]}" target="_blank">{f["name"]}</a> '
-            f' <small>({f["modified"]}, {f["size_bytes"]} B)</small></li>'
-            for f in items
-        )
-    html = f"""
-    <html><body>
-      <h1>Archives</h1>
-      <h2>CSV</h2>
-      <ul>{li(data["csv"]) or "<li>No archived CSV yet.</li>"}</ul>
-      <h2>PDF</h2>
-      <ul>{li(data["pdf"]) or "<li>No archived PDF yet.</li>"}</ul>
-    </body></html>
+    @router.get("/archives")
+    async def list_archives(
+        request: Request,
+        f: ArchiveFilters = Depends(),
+        manager: AuthUser = Depends(require_manager_async),
+        db: AsyncSession = Depends(get_async_db),
+    ):
+        pages = {}
+        for kind in f.kinds:
+            rows = (await db.execute(archive_page_stmt(manager.id, kind, f))).all()
+            pages[kind] = page_items(kind, rows, f.limit)
+        return catalog_response(request, pages)
+else:
+    @router.get("/archives")
+    def list_archives(
+        request: Request,
+        f: ArchiveFilters = Depends(),
+        manager: AuthUser = Depends(require_manager),
+        db: Session = Depends(get_db),
+    ):
+        return catalog_response(request, load_catalog(db, manager.id, f))
+
+@router.get("/archives/pack")
+def download_month_pack(
+    request: Request,
+    month: str = Query(..., pattern=r"^\d{4}-\d{2}$", description="YYYY-MM"),
+    manager: AuthUser = Depends(require_manager),
+    db: Session = Depends(get_db),
+):
+    """
+    The month's archived slips and CSVs as one ZIP (pdf/..., csv/...), streamed from
+    the archive (see app.archive_pack). Supports Range/If-Range, so interrupted
+    downloads can resume.
     """
-    return HTMLResponse(content=html, status_code=200)
\ No newline at end of file
+    month_start = datetime.strptime(month, "%Y-%m").date()
+    entries = db.scalars(
+        select(ArchiveEntry)
+        .where(ArchiveEntry.manager_id == manager.id, ArchiveEntry.month == month_start)
+        .order_by(ArchiveEntry.kind, ArchiveEntry.name)
+    ).all()
+    if not entries:
+        raise HTTPException(status_code=404, detail="Nothing archived for this month")
+
+    missing = [e for e in entries if e.crc32 is None]
+    for e in missing:  # archived before CRCs were recorded
+        _, e.crc32 = file_digests(blob_path(e.sha256))
+    if missing:
+        db.commit()
+
+    try:
+        pack = ZipPack([
+            PackMember(f"{e.kind}/{e.name}", blob_path(e.sha256), e.size_bytes, e.crc32, e.created_at)
+            for e in entries
+        ])
+    except PackTooLarge as exc:
+        raise HTTPException(status_code=413, detail=f"Month pack too large for a ZIP without zip64 ({exc})")
+
+    fingerprint = "\n".join(f"{e.kind}/{e.name} {e.sha256} {e.created_at.isoformat()}" for e in entries)
+    etag = '"' + hashlib.sha256(fingerprint.encode()).hexdigest()[:32] + '"'
+    last_modified = max(e.created_at for e in entries).replace(tzinfo=timezone.utc)
+    headers = {
+        "ETag": etag,
+        "Last-Modified": format_datetime(last_modified, usegmt=True),
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": f'attachment; filename="archive_{manager.id}_{month_start.strftime("%Y%m")}.zip"',
+    }
+    if etag in request.headers.get("If-None-Match", ""):
+        return Response(status_code=304, headers=headers)
+
+    range_header = request.headers.get("Range")
+    if_range = request.headers.get("If-Range")
+    if if_range and if_range != etag:
+        range_header = None  # the pack changed since the partial download started: send all of it
+    try:
+        span = parse_range(range_header, pack.size)
+    except ValueError:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{pack.size}"})
+
+    if span is None:
+        return StreamingResponse(pack.iter_bytes(), media_type="application/zip",
+                                 headers={**headers, "Content-Length": str(pack.size)})
+    start, end = span
+    return StreamingResponse(
+        pack.iter_bytes(start, end),
+        status_code=206,
+        media_type="application/zip",
+        headers={**headers, "Content-Range": f"bytes {start}-{end}/{pack.size}", "Content-Length": str(end - start + 1)},
+    )
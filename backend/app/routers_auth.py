@@ -3,30 +3,26 @@ from sqlalchemy.orm import Session
 from jose import jwt, JWTError
 
 from app.config import settings
-from app.security import verify_password, create_access_token
+from app.security import verify_and_update_password, create_access_token
+from app.executors import run_sync
 from app.crud import get_user_by_email, get_user
-from app.db import SessionLocal
+from app.deps import get_db
 from app.schemas import LoginRequest, TokenResponse, UserOut
-from app.models import User, UserRole as ModelRole
+from app.models import UserRole as ModelRole
+from app.auth_cache import AuthUser, user_cache
+from app.log import bind_log_context
 
 ALGORITHM = "HS256"
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 def bearer_token_from_request(request: Request) -> str:
     auth = request.headers.get("Authorization")
     if not auth or not auth.lower().startswith("bearer "):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
     return auth.split(" ", 1)[1].strip()
 
-def get_current_user(request: Request, db: Session = Depends(get_db)) -> User:
+def token_claims(request: Request) -> dict:
     token = bearer_token_from_request(request)
     try:
         # ✅ decode with the JWT secret from .env
@@ -34,24 +30,46 @@ def get_current_user(request: Request, db: Session = Depends(get_db)) -> User:
     except JWTError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
 
-    user_id = payload.get("sub")
-    if user_id is None:
+    if payload.get("sub") is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token payload")
+    bind_log_context(user_id=int(payload["sub"]))
+    return payload
 
-    user = get_user(db, int(user_id))
-    if not user:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+def load_auth_user(db: Session, user_id: int) -> AuthUser:
+    """The user from the cache, or from the database (then cached)."""
+    user = user_cache.get(user_id)
+    if user is None:
+        row = get_user(db, user_id)
+        if not row:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+        user = AuthUser.from_user(row)
+        user_cache.put(user)
     return user
 
-def require_manager(user: User = Depends(get_current_user)) -> User:
+def get_current_user(claims: dict = Depends(token_claims), db: Session = Depends(get_db)) -> AuthUser:
+    return load_auth_user(db, int(claims["sub"]))
+
+def require_manager(claims: dict = Depends(token_claims), db: Session = Depends(get_db)) -> AuthUser:
+    # Tokens carry the role they were issued with, which settles the "not a manager"
+    # case without a lookup. The authoritative check below still runs for managers,
+    # so a demotion takes effect as soon as the cached entry is invalidated.
+    if claims.get("role") != ModelRole.manager.value:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Managers only")
+    user = load_auth_user(db, int(claims["sub"]))
     if user.role != ModelRole.manager:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Managers only")
     return user
 
 @router.post("/login", response_model=TokenResponse)
-def login(data: LoginRequest, db: Session = Depends(get_db)):
-    user = get_user_by_email(db, data.email)
-    if not user or not verify_password(data.password, user.password_hash):
+async def login(data: LoginRequest, db: Session = Depends(get_db)):
+    # bcrypt runs on its own bounded thread pool (one thread per core by default), so a
+    # burst of logins queues there instead of taking the threads other endpoints use
+    user = await run_sync(get_user_by_email, db, data.email)
+    valid, new_hash = False, None
+    if user:
+        valid, new_hash = await run_sync(verify_and_update_password, data.password, user.password_hash,
+                                         workload="bcrypt")
+    if not valid:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid email or password")
 
     token = create_access_token(
@@ -59,15 +77,26 @@ def login(data: LoginRequest, db: Session = Depends(get_db)):
         secret=settings.jwt_secret,
         expires_minutes=int(settings.jwt_expire_minutes),
     )
+    if new_hash:
+        # BCRYPT_ROUNDS changed since this hash was made
+        user.password_hash = new_hash
+        await run_sync(db.commit)
     return TokenResponse(access_token=token)
 
-@router.get("/me", response_model=UserOut)
-def me(current_user: User = Depends(get_current_user)):
-    return current_user
+if settings.db_async:
+    from app.db_async import get_current_user_async
+
+    @router.get("/me", response_model=UserOut)
+    async def me(current_user: AuthUser = Depends(get_current_user_async)):
+        return current_user
+else:
+    @router.get("/me", response_model=UserOut)
+    def me(current_user: AuthUser = Depends(get_current_user)):
+        return current_user
 
 # Simple protected route for managers (to test role guard)
 manager_router = APIRouter(prefix="/manager", tags=["manager"])
 
 @manager_router.get("/ping")
-def manager_ping(_: User = Depends(require_manager)):
+def manager_ping(_: AuthUser = Depends(require_manager)):
     return {"ok": True, "who": "manager"}
@@ -0,0 +1,90 @@
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import FileResponse, Response
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+import mimetypes, os, re
+
+from app.config import settings
+from app.deps import get_db
+from app.models import ArchiveEntry
+from app.archive_store import ARCHIVE_KINDS, PRECOMPRESSED_KINDS, blob_path
+from app.auth_cache import AuthUser
+from app.routers_auth import require_manager
+
+router = APIRouter(tags=["files"])
+
+STORAGE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "storage"))
+os.makedirs(STORAGE_DIR, exist_ok=True)
+
+# Archived files under /files, for the manager they were archived for (same auth as /archives):
+#   archive/{pdf,csv}/<name>         a name from the archive_entries catalog; ETag is its content
+#                                    hash, but a name can be re-archived the same day, so
+#                                    clients revalidate (cheap 304s)
+#   archive/blobs/<aa>/<sha256>      content-addressed, never changes: cached for a year as immutable
+# Nothing else under storage is served (working files, .part / .fingerprint sidecars, the
+# .gz / .br variants, which are only sent as the encoding of their CSV). Payroll data, so
+# only the browser may cache it.
+IMMUTABLE = "private, max-age=31536000, immutable"
+REVALIDATE = "private, no-cache"
+_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+_SHA256 = re.compile(r"[0-9a-f]{64}")
+
+def _accepted(request: Request) -> set[str]:
+    accepted = set()
+    for part in request.headers.get("Accept-Encoding", "").split(","):
+        coding, _, params = part.strip().partition(";")
+        if coding and params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            accepted.add(coding.lower())
+    return accepted
+
+def _lookup(db: Session, manager_id: int, path: str) -> tuple[str, str, bool]:
+    """(kind, sha256, is_blob) of an archived file of this manager, or 404."""
+    parts = path.split("/")
+    entry = None
+    if len(parts) == 3 and parts[0] == "archive" and parts[1] in ARCHIVE_KINDS:
+        entry = db.execute(
+            select(ArchiveEntry.kind, ArchiveEntry.sha256)
+            .where(ArchiveEntry.kind == parts[1], ArchiveEntry.name == parts[2], ArchiveEntry.manager_id == manager_id)
+        ).first()
+    elif (len(parts) == 4 and parts[:2] == ["archive", "blobs"] and _SHA256.fullmatch(parts[3])
+          and parts[2] == parts[3][:2]):
+        entry = db.execute(
+            select(ArchiveEntry.kind, ArchiveEntry.sha256)
+            .where(ArchiveEntry.sha256 == parts[3], ArchiveEntry.manager_id == manager_id).limit(1)
+        ).first()
+    if entry is None or not os.path.isfile(blob_path(entry.sha256)):
+        raise HTTPException(status_code=404, detail="Not Found")
+    return entry.kind, entry.sha256, len(parts) == 4
+
+@router.api_route("/files/{path:path}", methods=["GET", "HEAD"])
+def serve_file(
+    path: str,
+    request: Request,
+    manager: AuthUser = Depends(require_manager),
+    db: Session = Depends(get_db),
+):
+    kind, sha256, is_blob = _lookup(db, manager.id, path)
+    media_type = mimetypes.guess_type(path if not is_blob else f"x.{kind}")[0] or "application/octet-stream"
+    served = blob_path(sha256)
+    etag = sha256
+    headers = {"Cache-Control": IMMUTABLE if is_blob else REVALIDATE}
+    if kind in PRECOMPRESSED_KINDS:
+        headers["Vary"] = "Accept-Encoding"
+        accepted = _accepted(request)
+        for coding, suffix in _ENCODINGS:
+            if coding in accepted and os.path.exists(served + suffix):
+                served += suffix
+                headers["Content-Encoding"] = coding
+                etag = f"{sha256}-{coding}"
+                break
+    headers["ETag"] = f'"{etag}"'
+
+    if headers["ETag"] in request.headers.get("If-None-Match", ""):
+        return Response(status_code=304, headers=headers)
+
+    if settings.files_accel_prefix and request.headers.get("X-Sendfile-Type") == "X-Accel-Redirect":
+        # nginx sends the file itself (sendfile, ranges); the app only decided what to send
+        rel = os.path.relpath(served, STORAGE_DIR).replace(os.sep, "/")
+        return Response(media_type=media_type, headers={**headers, "X-Accel-Redirect": settings.files_accel_prefix + rel})
+
+    return FileResponse(served, media_type=media_type, headers=headers)
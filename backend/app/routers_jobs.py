@@ -0,0 +1,17 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from app.deps import get_db
+from app.jobs import job_status
+from app.models import Job
+from app.auth_cache import AuthUser
+from app.routers_auth import require_manager
+
+router = APIRouter(tags=["jobs"])
+
+@router.get("/jobs/{job_id}")
+def get_job(job_id: int, manager: AuthUser = Depends(require_manager), db: Session = Depends(get_db)):
+    job = db.get(Job, job_id)
+    if job is None or job.manager_id != manager.id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_status(job)
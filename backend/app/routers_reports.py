@@ -1,142 +1,145 @@
 from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import select, func, and_
-from datetime import date, timedelta
-import calendar
-import os, csv, decimal, glob, shutil
+from datetime import date
+from typing import Iterator
+import os, io, csv, glob, hashlib, tempfile, uuid, zlib
 from datetime import datetime
 
 from app.db import SessionLocal
-from app.models import User, UserRole as ModelRole, WorkLog, Vacation, Bonus, Employment
+from app.deps import get_db
+from app.auth_cache import AuthUser
 from app.routers_auth import require_manager
 from app.idempotency import with_idempotency
 from app.emailer import send_email
 from app.config import settings
+from app.payroll import SalaryRecord, compute_month, iter_team, team_size
+from app.archive_store import BLOB_DIR, archive_bytes, archive_file
 
 router = APIRouter(tags=["reports"])
 
-def get_db():
-    db = SessionLocal()
+CSV_FIELDNAMES = [
+    "Employee name",
+    "Salary to be paid for the current month",
+    "Number of working days during the month",
+    "Number of vacation days taken",
+    "Additional bonuses (if any)",
+]
+
+def csv_row(rec: SalaryRecord) -> list:
+    return [
+        rec.full_name,
+        f"{rec.total_salary:.2f}",
+        rec.working_days,
+        rec.vacation_days,
+        f"{rec.bonus_total:.2f}",
+    ]
+
+def write_team_csv(manager_id: int, records: list[SalaryRecord], month: date) -> str:
+    """Write the aggregated CSV for a team and return its path."""
+    out_dir = os.path.join(os.path.dirname(__file__), "..", "storage", "csv")
+    out_dir = os.path.abspath(out_dir)
+    os.makedirs(out_dir, exist_ok=True)
+
+    filename = f"aggregated_{manager_id}_{month.strftime('%Y%m')}.csv"
+    out_path = os.path.join(out_dir, filename)
+
+    with open(out_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_FIELDNAMES)
+        writer.writerows(csv_row(rec) for rec in records)
+    return out_path
+
+def archive_csv_name(filename: str) -> str:
+    """Archive name for one export of `filename`; unique even for exports within the same second."""
+    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return f"{filename.removesuffix('.csv')}_{ts}_{uuid.uuid4().hex[:8]}.csv"
+
+def stream_team_csv(manager_id: int, month: date, archive_name: str) -> Iterator[str]:
+    """
+    Yield the team CSV chunk by chunk while writing and hashing the same bytes for
+    the archive. It is archived as `archive_name` once the whole export was
+    produced; an aborted download leaves nothing behind.
+    """
+    os.makedirs(BLOB_DIR, exist_ok=True)
+    fd, partial = tempfile.mkstemp(suffix=".part", dir=BLOB_DIR)  # same filesystem as the blobs
+    os.fchmod(fd, 0o644)  # becomes the blob, which nginx serves; mkstemp creates it 0600
+    digest, crc = hashlib.sha256(), 0
+    db = SessionLocal()  # outlives the request's own session, which closes before streaming starts
     try:
-        yield db
+        with os.fdopen(fd, "wb") as archive:
+            buf = io.StringIO()
+            writer = csv.writer(buf)
+            writer.writerow(CSV_FIELDNAMES)
+            for records in iter_team(db, manager_id, month, settings.csv_stream_chunk_size):
+                writer.writerows(csv_row(rec) for rec in records)
+                chunk = buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
+                data = chunk.encode("utf-8")
+                digest.update(data)
+                crc = zlib.crc32(data, crc)
+                archive.write(data)
+                yield chunk
+            if buf.tell():
+                data = buf.getvalue().encode("utf-8")
+                digest.update(data)
+                crc = zlib.crc32(data, crc)
+                archive.write(data)
+                yield buf.getvalue()
+        archive_file(db, partial, "csv", archive_name, sha256=digest.hexdigest(), crc32=crc, move=True,
+                     manager_id=manager_id, month=month)
+        db.commit()
     finally:
         db.close()
-
-def month_bounds(d: date):
-    first = d.replace(day=1)
-    last = d.replace(day=calendar.monthrange(d.year, d.month)[1])
-    return first, last
-
-def overlap_weekdays(start: date, end: date, month_start: date, month_end: date) -> int:
-    # count weekdays in the overlap of [start,end] and [month_start,month_end]
-    s = max(start, month_start)
-    e = min(end, month_end)
-    if s > e:
-        return 0
-    cur, days = s, 0
-    while cur <= e:
-        if cur.weekday() < 5:
-            days += 1
-        cur += timedelta(days=1)
-    return days
+        if os.path.exists(partial):
+            os.remove(partial)
 
 @router.post("/createAggregatedEmployeeData")
 @with_idempotency("createAggregatedEmployeeData")
 def create_aggregated_employee_data(
-    manager: User = Depends(require_manager),
+    manager: AuthUser = Depends(require_manager),
     db: Session = Depends(get_db),
     request: Request = None,   # ensures the idempotency decorator can read headers
 ):
     """Generates a CSV for the current manager with current-month metrics."""
     today = date.today()
-    month_start, month_end = month_bounds(today)
-
-    employees = db.scalars(
-        select(User)
-        .where(and_(User.role == ModelRole.employee, User.manager_id == manager.id))
-        .order_by(User.last_name, User.first_name)
-    ).all()
+    records = compute_month(db, manager.id, today)
 
-    if not employees:
+    if not records:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No employees for this manager")
 
-    rows = []
-    for emp in employees:
-        employment = db.scalar(select(Employment).where(Employment.user_id == emp.id))
-        base_salary = float(employment.base_salary) if employment and employment.base_salary is not None else 0.0
-
-        workdays = db.scalar(
-            select(func.count(WorkLog.id)).where(
-                and_(
-                    WorkLog.user_id == emp.id,
-                    WorkLog.work_date >= month_start,
-                    WorkLog.work_date <= month_end,
-                )
-            )
-        ) or 0
-
-        vacations = db.scalars(
-            select(Vacation).where(Vacation.user_id == emp.id)
-            .where(Vacation.end_date >= month_start)
-            .where(Vacation.start_date <= month_end)
-        ).all()
-        vacation_days = sum(
-            overlap_weekdays(v.start_date, v.end_date, month_start, month_end) for v in vacations
-        )
-
-        bonuses_sum_dec = db.scalar(
-            select(func.coalesce(func.sum(Bonus.amount), 0)).where(
-                and_(
-                    Bonus.user_id == emp.id,
-                    Bonus.bonus_date >= month_start,
-                    Bonus.bonus_date <= month_end,
-                )
-            )
-        ) or decimal.Decimal("0.00")
-        bonuses_sum = float(bonuses_sum_dec)
-
-        salary_to_pay = base_salary + bonuses_sum
-
-        rows.append(
-            {
-                "Employee name": f"{emp.first_name} {emp.last_name}",
-                "Salary to be paid for the current month": f"{salary_to_pay:.2f}",
-                "Number of working days during the month": workdays,
-                "Number of vacation days taken": vacation_days,
-                "Additional bonuses (if any)": f"{bonuses_sum:.2f}",
-            }
-        )
-
-    out_dir = os.path.join(os.path.dirname(__file__), "..", "storage", "csv")
-    out_dir = os.path.abspath(out_dir)
-    os.makedirs(out_dir, exist_ok=True)
-
-    filename = f"aggregated_{manager.id}_{today.strftime('%Y%m')}.csv"
-    out_path = os.path.join(out_dir, filename)
-
-    fieldnames = [
-        "Employee name",
-        "Salary to be paid for the current month",
-        "Number of working days during the month",
-        "Number of vacation days taken",
-        "Additional bonuses (if any)",
-    ]
-    with open(out_path, "w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(rows)
+    out_path = write_team_csv(manager.id, records, today)
 
     return {
         "ok": True,
         "file": out_path,
-        "employees": len(rows),
+        "employees": len(records),
         "month": today.strftime("%Y-%m"),
     }
 
+@router.get("/exportAggregatedEmployeeData")
+def export_aggregated_employee_data(
+    manager: AuthUser = Depends(require_manager),
+    db: Session = Depends(get_db),
+):
+    """Streams the current-month CSV as it is computed and archives the same bytes."""
+    today = date.today()
+    if not team_size(db, manager.id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No employees for this manager")
+
+    filename = f"aggregated_{manager.id}_{today.strftime('%Y%m')}.csv"
+
+    return StreamingResponse(
+        stream_team_csv(manager.id, today, archive_csv_name(filename)),
+        media_type="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
 @router.post("/sendAggregatedEmployeeData")
-@with_idempotency("sendAggregatedEmployeeData")
+@with_idempotency("sendAggregatedEmployeeData", workload="email")
 def send_aggregated_employee_data(
-    manager: User = Depends(require_manager),
+    manager: AuthUser = Depends(require_manager),
     db: Session = Depends(get_db),
     request: Request = None,
 ):
@@ -153,10 +156,10 @@ def send_aggregated_employee_data(
     if matches:
         csv_path = matches[0]
     else:
-        res = create_aggregated_employee_data(manager=manager, db=db, request=request)
-        if not res.get("ok"):
-            raise HTTPException(status_code=500, detail="Failed to create CSV")
-        csv_path = res["file"]
+        records = compute_month(db, manager.id, today)
+        if not records:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No employees for this manager")
+        csv_path = write_team_csv(manager.id, records, today)
 
     with open(csv_path, "rb") as f:
         csv_bytes = f.read()
@@ -176,11 +179,9 @@ def send_aggregated_employee_data(
         attachments=[(os.path.basename(csv_path), csv_bytes, "text/csv")],
     )
 
-    archive_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "storage", "archive", "csv"))
-    os.makedirs(archive_dir, exist_ok=True)
-    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-    archived_path = os.path.join(archive_dir, f"{os.path.basename(csv_path).removesuffix('.csv')}_{ts}.csv")
-    shutil.copy2(csv_path, archived_path)
+    archived_path = archive_bytes(db, csv_bytes, "csv", archive_csv_name(os.path.basename(csv_path)),
+                                  manager_id=manager.id, month=today)
+    db.commit()
 
     return {
         "ok": True,
@@ -3,7 +3,9 @@ from typing import Optional
 from passlib.context import CryptContext
 from jose import jwt
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from app.config import settings
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.bcrypt_rounds)
 
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
@@ -11,6 +13,10 @@ def hash_password(password: str) -> str:
 def verify_password(plain_password: str, password_hash: str) -> bool:
     return pwd_context.verify(plain_password, password_hash)
 
+def verify_and_update_password(plain_password: str, password_hash: str) -> tuple[bool, str | None]:
+    """Like verify_password, plus a new hash when the stored one was made with other than BCRYPT_ROUNDS."""
+    return pwd_context.verify_and_update(plain_password, password_hash)
+
 def create_access_token(*, data: dict, secret: str, expires_minutes: int = 60) -> str:
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + timedelta(minutes=expires_minutes)
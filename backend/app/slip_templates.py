@@ -0,0 +1,173 @@
+from dataclasses import dataclass
+from functools import lru_cache
+from string import Formatter
+import io, re
+
+from reportlab.pdfgen import canvas
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+
+
+# (label, value format) per line; None leaves an empty line
+DEFAULT_LINES = (
+    ("Name: ", "{full_name}"),
+    ("Employee ID (code): ", "{employee_code}"),
+    ("CNP: ", "{cnp}"),
+    ("Month: ", "{month_label}"),
+    None,
+    ("Base salary: ", "{base_salary:.2f} RON"),
+    ("Working days: ", "{working_days}"),
+    ("Vacation days: ", "{vacation_days}"),
+    ("Bonuses: ", "{bonus_total:.2f} RON"),
+    None,
+    ("Total salary to be paid: ", "{total_salary:.2f} RON"),
+)
+
+# Values that are the same for every slip of a batch; lines using only these go in the static layer
+STATIC_FIELDS = {"month_label"}
+
+
+@dataclass(frozen=True)
+class SlipTemplate:
+    """
+    Layout of a salary slip. Bump `version` whenever the rendered output changes,
+    it is part of the slip fingerprint.
+    """
+    name: str
+    version: int
+    title: str = "Salary Slip"
+    footer: str = "This PDF is password-protected. Password = employee CNP."
+    lines: tuple = DEFAULT_LINES
+    page_size: tuple[float, float] = A4
+    left: float = 25 * mm
+    title_font: tuple[str, int] = ("Helvetica-Bold", 16)
+    body_font: tuple[str, int] = ("Helvetica", 12)
+    footer_font: tuple[str, int] = ("Helvetica-Oblique", 9)
+
+    @property
+    def fonts(self) -> tuple[str, ...]:
+        return tuple(dict.fromkeys(f for f, _ in (self.title_font, self.body_font, self.footer_font)))
+
+
+SLIP_TEMPLATES: dict[str, SlipTemplate] = {}
+
+
+def register_slip_template(template: SlipTemplate) -> SlipTemplate:
+    SLIP_TEMPLATES[template.name] = template
+    compile_slip_template.cache_clear()
+    return template
+
+
+def ensure_slip_template(template: SlipTemplate):
+    """Register `template` unless this exact one already is (keeps the compiled cache)."""
+    if SLIP_TEMPLATES.get(template.name) != template:
+        register_slip_template(template)
+
+
+def get_slip_template(name: str) -> SlipTemplate:
+    try:
+        return SLIP_TEMPLATES[name]
+    except KeyError:
+        raise ValueError(f"Unknown slip template: {name}") from None
+
+
+class _StaticText:
+    """Pre-rendered text operators, drawable with Canvas.drawText."""
+    __slots__ = ("code",)
+
+    def __init__(self, code: str):
+        self.code = code
+
+    def getCode(self) -> str:
+        return self.code
+
+
+# "Tf" operator as ReportLab's text objects write it: /<internal font name> <size> Tf
+_FONT_OP = re.compile(r"(/F\d+)( [\d.]+ Tf )")
+
+
+class CompiledSlip:
+    """
+    A template laid out for one month: the static layer (title, labels, footer,
+    month) as ready-made PDF operators, plus the positions of per-employee values.
+    """
+    __slots__ = ("fonts", "font_names", "static", "body_font", "values", "_renamed")
+
+    def __init__(self, fonts: tuple[str, ...], font_names: tuple[str, ...], static: _StaticText,
+                 body_font: tuple[str, int], values: list[tuple[float, float, str]]):
+        self.fonts = fonts
+        self.font_names = font_names  # internal names (/F1, ...) `static` refers to `fonts` by
+        self.static = static
+        self.body_font = body_font
+        self.values = values
+        self._renamed: dict[tuple[str, ...], _StaticText] = {}
+
+    def _static_for(self, font_names: tuple[str, ...]) -> _StaticText:
+        """The static layer with its fonts referred to by `font_names` instead."""
+        if font_names == self.font_names:
+            return self.static
+        static = self._renamed.get(font_names)
+        if static is None:
+            names = dict(zip(self.font_names, font_names))
+            code = _FONT_OP.sub(lambda m: names[m[1]] + m[2], self.static.code)
+            static = self._renamed[font_names] = _StaticText(code)
+        return static
+
+    def draw(self, c: canvas.Canvas, fields: dict):
+        # Each canvas names fonts in the order it first meets them; look ours up (registering
+        # them if needed) rather than assume the order they had when the template was compiled.
+        font_names = tuple(c._doc.getInternalFontName(font) for font in self.fonts)
+        c.drawText(self._static_for(font_names))
+
+        t = c.beginText()
+        t.setFont(*self.body_font)
+        for x, y, fmt in self.values:
+            t.setTextOrigin(x, y)
+            t.textOut(fmt.format(**fields))
+        c.drawText(t)
+        c.showPage()
+
+
+def _field_names(fmt: str) -> set[str]:
+    return {name for _, name, _, _ in Formatter().parse(fmt) if name}
+
+
+@lru_cache(maxsize=64)
+def compile_slip_template(name: str, month_label: str) -> CompiledSlip:
+    template = get_slip_template(name)
+    scratch = canvas.Canvas(io.BytesIO(), pagesize=template.page_size)
+    width, height = template.page_size
+
+    font_names = tuple(scratch._doc.getInternalFontName(font) for font in template.fonts)
+    static = scratch.beginText()
+
+    y = height - 30 * mm
+    static.setFont(*template.title_font)
+    static.setTextOrigin(template.left, y)
+    static.textOut(template.title)
+    y -= 15 * mm
+
+    body_name, body_size = template.body_font
+    static.setFont(body_name, body_size)
+    values = []
+    for line in template.lines:
+        if line is not None:
+            label, fmt = line
+            static.setTextOrigin(template.left, y)
+            static.textOut(label)
+            x = template.left + scratch.stringWidth(label, body_name, body_size)
+            if _field_names(fmt) <= STATIC_FIELDS:
+                static.setTextOrigin(x, y)
+                static.textOut(fmt.format(month_label=month_label))
+            else:
+                values.append((x, y, fmt))
+        y -= 8 * mm
+
+    static.setFont(*template.footer_font)
+    static.setTextOrigin(template.left, 20 * mm)
+    static.textOut(template.footer)
+
+    return CompiledSlip(template.fonts, font_names, _StaticText(static.getCode()), template.body_font, values)
+
+
+register_slip_template(SlipTemplate(name="default", version=1))
@@ -0,0 +1,214 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Iterator
+import hashlib, io, json, multiprocessing, os, threading, time
+
+from reportlab.pdfgen import canvas
+from reportlab.lib.pdfencrypt import PadString, StandardEncryption, asBytes, encryptionkey, rawBytes, xorKey
+from reportlab.lib.pagesizes import A4
+
+try:
+    from cryptography.hazmat.primitives.ciphers import Cipher
+    try:
+        from cryptography.hazmat.decrepit.ciphers.algorithms import ARC4
+    except ImportError:  # cryptography < 43
+        from cryptography.hazmat.primitives.ciphers.algorithms import ARC4
+except ImportError:
+    ARC4 = None
+
+from app.config import settings
+from app.metrics import observe_stage
+from app.slip_templates import SlipTemplate, compile_slip_template, ensure_slip_template, get_slip_template
+
+
+def _rc4(key: bytes, data) -> bytes:
+    if isinstance(data, str):
+        data = data.encode("utf8")
+    return Cipher(ARC4(bytes(key)), mode=None).encryptor().update(bytes(data))
+
+
+class SlipEncryption(StandardEncryption):
+    """
+    StandardEncryption with RC4 from OpenSSL instead of ReportLab's pure-Python
+    ArcIV, whose key setup (41 keys to prepare a document, one per object) dominates
+    encrypted-slip rendering time. Same output as ReportLab's revision 3 (128-bit)
+    computeO / computeU / encodePDF; other strengths are left to ReportLab.
+    """
+
+    def prepare(self, document, overrideID=None):
+        if self.revision != 3 or ARC4 is None:
+            return super().prepare(document, overrideID)
+        if self.prepared:
+            raise ValueError("encryption already prepared!")
+        if overrideID:
+            internal_id = overrideID
+        else:
+            document.ID()
+            internal_id = document.signature.digest()
+        self.P = int(self.permissionBits() - 2**31)
+
+        digest = hashlib.md5((asBytes(self.ownerPassword) + PadString)[:32]).digest()
+        for _ in range(50):
+            digest = hashlib.md5(digest).digest()
+        self.O = (asBytes(self.userPassword) + PadString)[:32]
+        for i in range(20):
+            self.O = _rc4(xorKey(i, digest), self.O)
+
+        self.key = encryptionkey(self.userPassword, self.O, self.P, internal_id, revision=3)
+        u = hashlib.md5(PadString + rawBytes(internal_id)).digest()
+        for i in range(20):
+            u = _rc4(xorKey(i, self.key), u)
+        self.U = u + b"\0" * 16
+
+        self.objnum = self.version = None
+        self.prepared = 1
+
+    def encode(self, t):
+        if self.revision != 3 or ARC4 is None:
+            return super().encode(t)
+        if not self.prepared:
+            raise ValueError("encryption not prepared!")
+        if self.objnum is None:
+            raise ValueError("not registered in PDF object")
+        # per-object key: document key + low 3 bytes of the object number + low 2 of the generation
+        object_key = (self.key + (self.objnum & 0xFFFFFF).to_bytes(3, "little")
+                      + (self.version & 0xFFFF).to_bytes(2, "little"))
+        return _rc4(hashlib.md5(object_key).digest(), t)
+
+
+# ---------- PDF generation ----------
+def draw_slip(c: canvas.Canvas, fields: dict, template: str | None = None):
+    """Draw the salary slip page onto a canvas using the cached template layer."""
+    compiled = compile_slip_template(template or settings.slip_template, fields["month_label"])
+    compiled.draw(c, fields)
+
+
+def _render_pdf(
+    *,
+    full_name: str,
+    employee_code: str,
+    cnp: str,
+    month_label: str,
+    base_salary: float,
+    working_days: int,
+    vacation_days: int,
+    bonus_total: float,
+    total_salary: float,
+    template: str | None = None,
+) -> tuple[bytes, float, float]:
+    """The PDF, plus seconds spent drawing it and serializing (and encrypting) it."""
+    started = time.perf_counter()
+    buf = io.BytesIO()
+    c = canvas.Canvas(
+        buf,
+        pagesize=A4,
+        encrypt=SlipEncryption(cnp, ownerPassword=cnp, strength=128),
+    )
+    draw_slip(
+        c,
+        dict(
+            full_name=full_name,
+            employee_code=employee_code,
+            cnp=cnp,
+            month_label=month_label,
+            base_salary=base_salary,
+            working_days=working_days,
+            vacation_days=vacation_days,
+            bonus_total=bonus_total,
+            total_salary=total_salary,
+        ),
+        template,
+    )
+    drawn = time.perf_counter()
+    c.save()
+    return buf.getvalue(), drawn - started, time.perf_counter() - drawn
+
+
+def _observe_render(draw_seconds: float, save_seconds: float):
+    observe_stage("pdf.draw", draw_seconds)
+    observe_stage("pdf.serialize", save_seconds)
+
+
+def gen_pdf_bytes(**slip: Any) -> bytes:
+    """
+    Generate a password-protected salary slip PDF.
+    ReportLab encrypts while serializing (RC4 128-bit, same as pypdf's default),
+    so the document is written once instead of being re-parsed and re-encrypted.
+    """
+    pdf, draw_seconds, save_seconds = _render_pdf(**slip)
+    _observe_render(draw_seconds, save_seconds)
+    return pdf
+
+
+def slip_fingerprint(slip: dict[str, Any]) -> str:
+    """
+    SHA-256 over everything that affects a slip's bytes except the encryption salt:
+    the gen_pdf_bytes inputs plus the template name and version.
+    """
+    template = get_slip_template(slip.get("template") or settings.slip_template)
+    payload = {**slip, "template": template.name, "template_version": template.version}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+# ---------- Batch rendering ----------
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+def _render_chunk(start: int, chunk: list[dict[str, Any]],
+                  templates: list[SlipTemplate]) -> list[tuple[int, bytes, float, float]]:
+    # a spawned worker only has the templates registered at import; the parent's come with the task
+    for template in templates:
+        ensure_slip_template(template)
+    # timings travel back with the PDFs: metrics recorded in a pool process would never be scraped
+    return [(start + i, *_render_pdf(**slip)) for i, slip in enumerate(chunk)]
+
+
+def get_render_pool() -> ProcessPoolExecutor:
+    """Process pool shared by all requests; created on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.pdf_pool_size or os.cpu_count() or 1,
+                # spawn: the API process runs threads, forking it is not safe
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def shutdown_render_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True, cancel_futures=True)
+            _pool = None
+
+
+def render_slips(slips: list[dict[str, Any]]) -> Iterator[tuple[int, bytes]]:
+    """
+    Render every slip (_render_pdf keyword arguments) and yield (index, pdf_bytes).
+    In "process" mode slips are rendered in chunks across a process pool and yielded
+    as soon as each chunk finishes, so results may come back out of order.
+    """
+    if settings.pdf_render_mode != "process" or len(slips) <= settings.pdf_chunk_size:
+        for idx, slip in enumerate(slips):
+            yield idx, gen_pdf_bytes(**slip)
+        return
+
+    # name each slip's template here: the workers' settings and registry may differ from ours
+    slips = [{**slip, "template": slip.get("template") or settings.slip_template} for slip in slips]
+    templates = [get_slip_template(name) for name in dict.fromkeys(slip["template"] for slip in slips)]
+    pool = get_render_pool()
+    size = settings.pdf_chunk_size
+    futures = [
+        pool.submit(_render_chunk, start, slips[start:start + size], templates)
+        for start in range(0, len(slips), size)
+    ]
+    try:
+        for fut in as_completed(futures):
+            for idx, pdf, draw_seconds, save_seconds in fut.result():
+                _observe_render(draw_seconds, save_seconds)
+                yield idx, pdf
+    finally:
+        for fut in futures:
+            fut.cancel()
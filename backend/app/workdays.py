@@ -0,0 +1,131 @@
+from bisect import bisect_left, bisect_right
+from datetime import date, timedelta
+from typing import Callable, Iterable, Iterator, Sequence
+import threading
+
+try:  # optional: vectorised path for large batches of spans
+    import numpy as np
+except ImportError:
+    np = None
+
+from app.config import settings
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+# _PARTIAL[w][n] = Mon-Fri days among n consecutive days starting on weekday w (0=Mon)
+_PARTIAL = [[sum(1 for i in range(n) if (w + i) % 7 < 5) for n in range(7)] for w in range(7)]
+
+
+def weekdays_between(start: date, end: date) -> int:
+    """Number of Mon-Fri days in [start, end], inclusive; 0 if the range is empty."""
+    if start > end:
+        return 0
+    weeks, rest = divmod((end - start).days + 1, 7)
+    return weeks * 5 + _PARTIAL[start.weekday()][rest]
+
+
+def orthodox_easter(year: int) -> date:
+    # Meeus' Julian algorithm, shifted to the Gregorian calendar (valid 1900-2099)
+    a, b, c = year % 4, year % 7, year % 19
+    d = (19 * c + 15) % 30
+    e = (2 * a + 4 * b - d + 34) % 7
+    month, day = divmod(d + e + 114, 31)
+    return date(year, month, day + 1) + timedelta(days=13)
+
+
+def romanian_holidays(year: int) -> list[date]:
+    """Legal public holidays in Romania (Codul muncii, art. 139)."""
+    fixed = [(1, 1), (1, 2), (1, 24), (5, 1), (6, 1), (8, 15), (11, 30), (12, 1), (12, 25), (12, 26)]
+    if year >= 2024:
+        fixed += [(1, 6), (1, 7)]
+    easter = orthodox_easter(year)
+    movable = [easter + timedelta(days=n) for n in (-2, 0, 1, 49, 50)]  # Good Friday .. Whit Monday
+    return sorted({date(year, m, d) for m, d in fixed} | set(movable))
+
+
+class HolidayCalendar:
+    """Public holidays produced per year by `rule`, cached as a sorted list of weekday dates."""
+
+    def __init__(self, name: str, rule: Callable[[int], Iterable[date]] | None = None):
+        self.name = name
+        self.rule = rule
+        self._years: dict[int, list[date]] = {}
+        self._lock = threading.Lock()
+
+    def for_year(self, year: int) -> list[date]:
+        days = self._years.get(year)
+        if days is None:
+            days = sorted(d for d in (self.rule(year) if self.rule else ()) if d.weekday() < 5)
+            with self._lock:
+                self._years[year] = days
+        return days
+
+    def between(self, start: date, end: date) -> list[date]:
+        """Holidays falling on a weekday in [start, end]."""
+        out: list[date] = []
+        for year in range(start.year, end.year + 1):
+            days = self.for_year(year)
+            out += days[bisect_left(days, start):bisect_right(days, end)]
+        return out
+
+    def business_days(self, start: date, end: date) -> int:
+        if start > end:
+            return 0
+        return weekdays_between(start, end) - len(self.between(start, end))
+
+
+HOLIDAY_CALENDARS: dict[str, HolidayCalendar] = {}
+
+
+def register_holiday_calendar(cal: HolidayCalendar):
+    HOLIDAY_CALENDARS[cal.name] = cal
+
+
+def get_holiday_calendar(name: str | None = None) -> HolidayCalendar:
+    name = name or settings.holiday_calendar
+    try:
+        return HOLIDAY_CALENDARS[name]
+    except KeyError:
+        raise ValueError(f"Unknown holiday calendar: {name}") from None
+
+
+def business_days(start: date, end: date, cal: HolidayCalendar | None = None) -> int:
+    """Business days in [start, end] under `cal` (default: HOLIDAY_CALENDAR setting)."""
+    return (cal or get_holiday_calendar()).business_days(start, end)
+
+
+def iter_business_days(start: date, end: date, cal: HolidayCalendar | None = None) -> Iterator[date]:
+    cal = cal or get_holiday_calendar()
+    holidays = set(cal.between(start, end))
+    cur = start
+    while cur <= end:
+        if cur.weekday() < 5 and cur not in holidays:
+            yield cur
+        cur += timedelta(days=1)
+
+
+def overlap_business_days(start: date, end: date, month_start: date, month_end: date,
+                          cal: HolidayCalendar | None = None) -> int:
+    """Business days in the overlap of [start, end] and [month_start, month_end]."""
+    return business_days(max(start, month_start), min(end, month_end), cal)
+
+
+def overlap_business_days_many(spans: Sequence[tuple[date, date]], month_start: date, month_end: date,
+                               cal: HolidayCalendar | None = None) -> list[int]:
+    """overlap_business_days for many (start, end) spans at once; uses numpy.busday_count when installed."""
+    cal = cal or get_holiday_calendar()
+    if np is None or len(spans) < 64:
+        return [cal.business_days(max(s, month_start), min(e, month_end)) for s, e in spans]
+
+    # ordinals -> days since 1970-01-01 is far cheaper than converting date objects one by one
+    ordinals = np.fromiter((d.toordinal() for span in spans for d in span), dtype=np.int64, count=2 * len(spans))
+    bounds = (ordinals - _EPOCH_ORDINAL).astype("datetime64[D]").reshape(-1, 2)
+    starts = np.maximum(bounds[:, 0], np.datetime64(month_start, "D"))
+    ends = np.minimum(bounds[:, 1], np.datetime64(month_end, "D")) + 1  # busday_count's end is exclusive
+    holidays = np.array(cal.between(month_start, month_end), dtype="datetime64[D]")
+    counts = np.busday_count(starts, np.maximum(ends, starts), holidays=holidays)
+    return counts.tolist()
+
+
+register_holiday_calendar(HolidayCalendar("none"))
+register_holiday_calendar(HolidayCalendar("ro", romanian_holidays))
@@ -0,0 +1,20 @@
+"""
+Standalone job worker, for JOB_WORKER_MODE=external:
+
+    python -m app.worker
+"""
+import signal, threading
+
+from app.jobs import work_forever
+from app.log import configure_logging
+import app.routers_pdfs  # noqa: F401  registers the PDF job handlers
+
+def main():
+    configure_logging()
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    work_forever(stop)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+"""payroll indexes
+
+Revision ID: a41f0c9e7d52
+Revises: 3b7e2c91d4a0
+Create Date: 2025-11-04 09:31:02.551730
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a41f0c9e7d52'
+down_revision: Union[str, Sequence[str], None] = '3b7e2c91d4a0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_users_role_manager_id', 'users', ['role', 'manager_id', 'id'])
+    op.create_index('ix_bonuses_user_date', 'bonuses', ['user_id', 'bonus_date'], postgresql_include=['amount'])
+    op.create_index('ix_vacations_user_end_start', 'vacations', ['user_id', 'end_date', 'start_date'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_vacations_user_end_start', table_name='vacations')
+    op.drop_index('ix_bonuses_user_date', table_name='bonuses')
+    op.drop_index('ix_users_role_manager_id', table_name='users')
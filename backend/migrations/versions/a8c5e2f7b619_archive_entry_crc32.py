@@ -0,0 +1,29 @@
+"""archive entry crc32
+
+Revision ID: a8c5e2f7b619
+Revises: f4b2c9d6e813
+Create Date: 2025-11-08 09:52:27.113640
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a8c5e2f7b619'
+down_revision: Union[str, Sequence[str], None] = 'f4b2c9d6e813'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('archive_entries', sa.Column('crc32', sa.BigInteger(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('archive_entries') as batch_op:
+        batch_op.drop_column('crc32')
@@ -0,0 +1,39 @@
+"""idempotency claims and expiry
+
+Revision ID: b7f3e9a1c254
+Revises: e5c8d1f3a296
+Create Date: 2025-11-06 10:21:37.518204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7f3e9a1c254'
+down_revision: Union[str, Sequence[str], None] = 'e5c8d1f3a296'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('idempotency_records') as batch_op:
+        batch_op.add_column(sa.Column('state', sa.String(length=20), server_default='done', nullable=False))
+        batch_op.add_column(sa.Column('expires_at', sa.DateTime(), nullable=True))
+        batch_op.alter_column('status_code', existing_type=sa.Integer(), nullable=True)
+        batch_op.alter_column('response_json', existing_type=sa.JSON(), nullable=True)
+        batch_op.create_index('ix_idempotency_records_expires_at', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DELETE FROM idempotency_records WHERE state <> 'done'")
+    with op.batch_alter_table('idempotency_records') as batch_op:
+        batch_op.drop_index('ix_idempotency_records_expires_at')
+        batch_op.alter_column('response_json', existing_type=sa.JSON(), nullable=False)
+        batch_op.alter_column('status_code', existing_type=sa.Integer(), nullable=False)
+        batch_op.drop_column('expires_at')
+        batch_op.drop_column('state')
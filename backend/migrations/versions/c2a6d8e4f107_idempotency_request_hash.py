@@ -0,0 +1,60 @@
+"""idempotency request hash and compressed responses
+
+Revision ID: c2a6d8e4f107
+Revises: b7f3e9a1c254
+Create Date: 2025-11-06 16:42:05.927311
+
+"""
+from typing import Sequence, Union
+import json, zlib
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c2a6d8e4f107'
+down_revision: Union[str, Sequence[str], None] = 'b7f3e9a1c254'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+records = sa.table('idempotency_records',
+    sa.column('id', sa.Integer()),
+    sa.column('response_json', sa.JSON()),
+    sa.column('response_body', sa.LargeBinary()),
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('idempotency_records') as batch_op:
+        batch_op.add_column(sa.Column('request_hash', sa.String(length=64), nullable=True))
+        batch_op.add_column(sa.Column('response_body', sa.LargeBinary(), nullable=True))
+
+    conn = op.get_bind()
+    rows = conn.execute(sa.select(records.c.id, records.c.response_json)
+                        .where(records.c.response_json.is_not(None))).all()
+    for id_, payload in rows:
+        body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode()
+        conn.execute(records.update().where(records.c.id == id_).values(response_body=zlib.compress(body)))
+
+    with op.batch_alter_table('idempotency_records') as batch_op:
+        batch_op.drop_column('response_json')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('idempotency_records') as batch_op:
+        batch_op.add_column(sa.Column('response_json', sa.JSON(), nullable=True))
+
+    conn = op.get_bind()
+    rows = conn.execute(sa.select(records.c.id, records.c.response_body)
+                        .where(records.c.response_body.is_not(None))).all()
+    for id_, body in rows:
+        if body[:1] == b"\x78":
+            body = zlib.decompress(body)
+        conn.execute(records.update().where(records.c.id == id_).values(response_json=json.loads(body)))
+
+    with op.batch_alter_table('idempotency_records') as batch_op:
+        batch_op.drop_column('response_body')
+        batch_op.drop_column('request_hash')
@@ -0,0 +1,40 @@
+"""payroll month summary
+
+Revision ID: e5c8d1f3a296
+Revises: a41f0c9e7d52
+Create Date: 2025-11-05 14:07:48.302115
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5c8d1f3a296'
+down_revision: Union[str, Sequence[str], None] = 'a41f0c9e7d52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('payroll_month_summary',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('month', sa.Date(), nullable=False),
+    sa.Column('base_salary', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.Column('working_days', sa.Integer(), nullable=False),
+    sa.Column('vacation_days', sa.Integer(), nullable=False),
+    sa.Column('bonus_total', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('computed_version', sa.Integer(), nullable=True),
+    sa.Column('refreshed_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'month')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('payroll_month_summary')
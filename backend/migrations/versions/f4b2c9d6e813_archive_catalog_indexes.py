@@ -0,0 +1,30 @@
+"""archive catalog indexes
+
+Revision ID: f4b2c9d6e813
+Revises: d9e1b4c7a358
+Create Date: 2025-11-07 15:36:12.804527
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f4b2c9d6e813'
+down_revision: Union[str, Sequence[str], None] = 'd9e1b4c7a358'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_archive_entries_manager_kind_id', 'archive_entries', ['manager_id', 'kind', 'id'], unique=False)
+    op.create_index('ix_archive_entries_user_kind_id', 'archive_entries', ['user_id', 'kind', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_archive_entries_user_kind_id', table_name='archive_entries')
+    op.drop_index('ix_archive_entries_manager_kind_id', table_name='archive_entries')
@@ -0,0 +1,65 @@
+"""
+Throughput of /auth/me and /archives against a running API, for comparing DB_ASYNC modes.
+
+    python -m scripts.bench_async [base_url] [--concurrency 1,8,32,64] [--seconds 5]
+
+Start the server once with DB_ASYNC=false and once with DB_ASYNC=true (same
+Postgres, same worker count) and run this against each; it prints req/s and
+p50/p99 latency per endpoint and concurrency level.
+"""
+import argparse, json, threading, time, urllib.request
+
+def request(url: str, data: dict | None = None, headers: dict | None = None):
+    body = json.dumps(data).encode() if data is not None else None
+    req = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json", **(headers or {})},
+                                 method="POST" if body is not None else "GET")
+    with urllib.request.urlopen(req, timeout=30) as resp:
+        return json.loads(resp.read() or b"null")
+
+def run(url: str, headers: dict, concurrency: int, seconds: float) -> tuple[int, int, list[float]]:
+    timings: list[float] = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+
+    def client():
+        local, failed = [], 0
+        while time.monotonic() < deadline:
+            t0 = time.perf_counter()
+            try:
+                request(url, headers=headers)
+                local.append((time.perf_counter() - t0) * 1000)
+            except Exception:
+                failed += 1
+        with lock:
+            timings.extend(local)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return len(timings), errors[0], sorted(timings)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("base", nargs="?", default="http://127.0.0.1:8000")
+    parser.add_argument("--email", default="manager@example.com")
+    parser.add_argument("--password", default="Passw0rd!")
+    parser.add_argument("--concurrency", default="1,8,32,64")
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+
+    token = request(f"{args.base}/auth/login", {"email": args.email, "password": args.password})["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    for path in ("/auth/me", "/archives"):
+        for concurrency in (int(c) for c in args.concurrency.split(",")):
+            n, errors, t = run(f"{args.base}{path}", headers, concurrency, args.seconds)
+            p = lambda q: t[min(len(t) - 1, int(len(t) * q))] if t else float("nan")
+            print(f"{path:<10} c={concurrency:<3d} {n / args.seconds:8.1f} req/s  "
+                  f"p50={p(0.5):7.2f} ms  p99={p(0.99):7.2f} ms  errors={errors}")
+
+if __name__ == "__main__":
+    main()
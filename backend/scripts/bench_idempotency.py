@@ -0,0 +1,98 @@
+"""
+Store size and hit/miss rate of the idempotency store when many keys are replayed.
+
+    python -m scripts.bench_idempotency [--keys 500] [--replays 3] [--team 200] [--cache-size N]
+
+Runs an endpoint decorated with with_idempotency in-process against DATABASE_URL
+(migrated schema required). Its response looks like a team send result with one
+entry per employee. Every key is sent once and then replayed --replays times in
+random order. The script prints the bytes stored per record next to the raw JSON
+size, the hit/miss counters and the mean latency of first calls and replays. Use a
+--cache-size below --keys to see replays served from the database rather than the
+in-process LRU. The bench-* records are deleted at the end.
+"""
+import argparse, json, random, time
+
+import anyio
+from sqlalchemy import delete, func, select
+from starlette.requests import Request
+
+from app import idempotency
+from app.db import SessionLocal
+from app.idempotency import idempotency_stats, with_idempotency
+from app.models import IdempotencyRecord
+
+def make_request(key: str) -> Request:
+    scope = {"type": "http", "method": "POST", "path": "/bench", "query_string": b"",
+             "headers": [(b"idempotency-key", key.encode())]}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    return Request(scope, receive)
+
+def team_result(team: int) -> dict:
+    return {
+        "ok": True,
+        "month": "2025-11",
+        "sent": [
+            {"user_id": i, "email": f"employee{i}@example.com", "file": f"/app/storage/pdf/slip_{i}_202511.pdf"}
+            for i in range(team)
+        ],
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--keys", type=int, default=500)
+    parser.add_argument("--replays", type=int, default=3)
+    parser.add_argument("--team", type=int, default=200, help="employees in each stored response")
+    parser.add_argument("--cache-size", type=int, default=None, help="override IDEMPOTENCY_CACHE_SIZE")
+    args = parser.parse_args()
+
+    if args.cache_size is not None:
+        idempotency._completed.maxsize = args.cache_size
+    result = team_result(args.team)
+    raw_size = len(json.dumps(result, separators=(",", ":")))
+
+    @with_idempotency("bench")
+    def endpoint(request: Request = None):
+        return result
+
+    run_id = f"bench-{int(time.time())}"
+    keys = [f"{run_id}-{i}" for i in range(args.keys)]
+    replays = keys * args.replays
+    random.shuffle(replays)
+
+    async def run(batch: list[str]) -> float:
+        t0 = time.perf_counter()
+        for key in batch:
+            await endpoint(request=make_request(key))
+        return (time.perf_counter() - t0) / max(len(batch), 1) * 1000
+
+    first_ms = anyio.run(run, keys)
+    replay_ms = anyio.run(run, replays)
+
+    db = SessionLocal()
+    try:
+        count, stored = db.execute(
+            select(func.count(), func.sum(func.length(IdempotencyRecord.response_body)))
+            .where(IdempotencyRecord.key.like(f"{run_id}-%"))
+        ).one()
+        db.execute(delete(IdempotencyRecord).where(IdempotencyRecord.key.like(f"{run_id}-%")))
+        db.commit()
+    finally:
+        db.close()
+
+    stats = idempotency_stats()
+    requests = stats["hits"] + stats["misses"]
+    print(f"records          {count}")
+    print(f"raw JSON         {raw_size} B/record")
+    print(f"stored           {stored / count:.0f} B/record ({stored / count / raw_size:.1%} of raw)")
+    print(f"hit rate         {stats['hits'] / requests:.1%} ({stats['hits']} hits, {stats['misses']} misses)")
+    print(f"  from memory    {stats['hits_memory']} (cache size {idempotency._completed.maxsize})")
+    print(f"  from database  {stats['hits'] - stats['hits_memory']}")
+    print(f"first call       {first_ms:.2f} ms")
+    print(f"replay           {replay_ms:.2f} ms")
+
+if __name__ == "__main__":
+    main()
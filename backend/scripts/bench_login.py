@@ -0,0 +1,67 @@
+"""
+/auth/login latency and throughput at several concurrency levels, against a running API.
+
+    python -m scripts.bench_login [base_url] [--concurrency 1,4,16,64] [--seconds 5]
+
+Every request is a successful login (bcrypt verify). Prints req/s and p50/p99 per
+concurrency level, then the server's /health/executors view of the bcrypt pool
+(queue depth and queue wait). Compare THREADS_BCRYPT / BCRYPT_ROUNDS settings
+by restarting the server between runs.
+"""
+import argparse, json, threading, time, urllib.request
+
+def request(url: str, data: dict | None = None):
+    body = json.dumps(data).encode() if data is not None else None
+    req = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"},
+                                 method="POST" if body is not None else "GET")
+    with urllib.request.urlopen(req, timeout=120) as resp:
+        return json.loads(resp.read() or b"null")
+
+def run(url: str, credentials: dict, concurrency: int, seconds: float) -> tuple[list[float], int]:
+    timings: list[float] = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+
+    def client():
+        local, failed = [], 0
+        while time.monotonic() < deadline:
+            t0 = time.perf_counter()
+            try:
+                request(url, credentials)
+                local.append((time.perf_counter() - t0) * 1000)
+            except Exception:
+                failed += 1
+        with lock:
+            timings.extend(local)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return sorted(timings), errors[0]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("base", nargs="?", default="http://127.0.0.1:8000")
+    parser.add_argument("--email", default="manager@example.com")
+    parser.add_argument("--password", default="Passw0rd!")
+    parser.add_argument("--concurrency", default="1,4,16,64")
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+
+    credentials = {"email": args.email, "password": args.password}
+    request(f"{args.base}/auth/login", credentials)  # warm up, and rehash if BCRYPT_ROUNDS changed
+
+    for concurrency in (int(c) for c in args.concurrency.split(",")):
+        t, errors = run(f"{args.base}/auth/login", credentials, concurrency, args.seconds)
+        p = lambda q: t[min(len(t) - 1, int(len(t) * q))] if t else float("nan")
+        print(f"c={concurrency:<3d} {len(t) / args.seconds:7.1f} logins/s  "
+              f"p50={p(0.5):8.2f} ms  p99={p(0.99):8.2f} ms  errors={errors}")
+
+    print("bcrypt pool:", request(f"{args.base}/health/executors").get("bcrypt"))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Per-slip latency and peak memory: single-pass ReportLab encryption vs the old
+ReportLab -> pypdf re-parse -> encrypt pipeline.
+
+    python -m scripts.bench_pdf [iterations]
+"""
+import io, statistics, sys, time, tracemalloc
+
+from pypdf import PdfReader, PdfWriter
+from reportlab.pdfgen import canvas
+from reportlab.lib.pagesizes import A4
+
+from app.slips import draw_slip, gen_pdf_bytes
+
+SLIP = dict(
+    full_name="Alice Ionescu",
+    employee_code="EMP001",
+    cnp="2980202123456",
+    month_label="October 2025",
+    base_salary=7000.0,
+    working_days=21,
+    vacation_days=2,
+    bonus_total=500.0,
+    total_salary=7500.0,
+)
+
+def two_stage_pdf_bytes(**slip) -> bytes:
+    buf = io.BytesIO()
+    c = canvas.Canvas(buf, pagesize=A4)
+    draw_slip(c, slip)
+    c.save()
+
+    reader = PdfReader(io.BytesIO(buf.getvalue()))
+    writer = PdfWriter()
+    for page in reader.pages:
+        writer.add_page(page)
+    writer.encrypt(user_password=slip["cnp"], owner_password=slip["cnp"])
+    out = io.BytesIO()
+    writer.write(out)
+    return out.getvalue()
+
+def bench(name: str, fn, iterations: int):
+    fn(**SLIP)  # warm-up (font metrics, imports)
+    timings = []
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        fn(**SLIP)
+        timings.append((time.perf_counter() - t0) * 1000)
+
+    tracemalloc.start()
+    size = len(fn(**SLIP))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    timings.sort()
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"{name:<12} mean={statistics.mean(timings):7.3f} ms  p50={timings[len(timings) // 2]:7.3f} ms  "
+          f"p95={p95:7.3f} ms  peak={peak / 1024:8.1f} KiB  size={size} B")
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    assert PdfReader(io.BytesIO(gen_pdf_bytes(**SLIP))).decrypt(SLIP["cnp"])
+    bench("two-stage", two_stage_pdf_bytes, iterations)
+    bench("single-pass", gen_pdf_bytes, iterations)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Messages per second: one SMTP connection per message (the old send_email) vs
+the pooled sender. Point SMTP_HOST/SMTP_PORT at MailHog (docker compose up -d).
+
+    python -m scripts.bench_smtp [messages] [pool_size]
+"""
+import smtplib, sys, time
+
+from app.config import settings
+from app.emailer import SMTPPool, build_message
+
+def make_messages(n: int):
+    attachment = b"%PDF-1.4\n" + b"0" * 2500
+    return [
+        build_message(
+            subject=f"Bench {i}",
+            sender="noreply@slip-salary.local",
+            recipients=[f"bench{i}@example.com"],
+            body="Benchmark message.",
+            attachments=[(f"slip_{i}.pdf", attachment, "application/pdf")],
+        )
+        for i in range(n)
+    ]
+
+def per_message(messages):
+    for msg in messages:
+        with smtplib.SMTP(host=settings.smtp_host, port=settings.smtp_port) as smtp:
+            smtp.send_message(msg)
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    size = int(sys.argv[2]) if len(sys.argv) > 2 else settings.smtp_pool_size
+    print(f"SMTP {settings.smtp_host}:{settings.smtp_port}, {n} messages")
+
+    messages = make_messages(n)
+    t0 = time.perf_counter()
+    per_message(messages)
+    elapsed = time.perf_counter() - t0
+    print(f"per-message connect  {n / elapsed:8.1f} msg/s")
+
+    pool = SMTPPool(settings.smtp_host, settings.smtp_port, size=size)
+    t0 = time.perf_counter()
+    results = pool.send_many(messages)
+    elapsed = time.perf_counter() - t0
+    pool.close()
+    failed = sum(1 for r in results if not r.ok)
+    print(f"pooled (size={size})     {n / elapsed:8.1f} msg/s  failed={failed}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""
+Time app.workdays against a day-by-day loop (correctness is covered by tests/test_workdays.py).
+
+    python -m scripts.bench_workdays [spans]
+
+Uses the vectorised overlap_business_days_many path when numpy is installed.
+"""
+import random, sys, time
+from datetime import date, timedelta
+
+from app import workdays
+from app.workdays import HOLIDAY_CALENDARS, overlap_business_days_many
+
+def naive(start: date, end: date) -> int:
+    days, cur = 0, start
+    while cur <= end:
+        if cur.weekday() < 5:
+            days += 1
+        cur += timedelta(days=1)
+    return days
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    rng = random.Random(1234)
+    spans = []
+    for _ in range(count):
+        start = date(2000, 1, 1) + timedelta(days=rng.randrange(365 * 40))
+        spans.append((start, start + timedelta(days=rng.randrange(0, 120))))
+
+    month_start, month_end = date(2025, 5, 1), date(2025, 5, 31)
+    t0 = time.perf_counter()
+    for s, e in spans:
+        naive(max(s, month_start), min(e, month_end))
+    t1 = time.perf_counter()
+    overlap_business_days_many(spans, month_start, month_end, HOLIDAY_CALENDARS["none"])
+    t2 = time.perf_counter()
+    print(f"{len(spans)} overlaps: loop {(t1 - t0) * 1000:.1f} ms, workdays {(t2 - t1) * 1000:.1f} ms "
+          f"(numpy={'yes' if workdays.np else 'no'})")
+
+if __name__ == "__main__":
+    main()
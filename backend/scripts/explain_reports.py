@@ -0,0 +1,138 @@
+"""
+EXPLAIN the payroll report queries and fail on sequential scans of the hot tables.
+
+    python -m scripts.explain_reports [--seed TEAMS] [--team-size N]
+
+The queries are captured from the real code paths (team_size, team_member_ids,
+compute_month, iter_team) and EXPLAINed on DATABASE_URL, Postgres or SQLite.
+Exits 1 if any of them reads users, bonuses, vacations, work_logs or
+payroll_month_summary with a sequential scan (Postgres), or scans any table
+instead of searching an index (SQLite). tests/test_explain_reports.py runs the
+same check on a seeded SQLite database. --seed inserts TEAMS managers with
+N employees each, plus a month of work logs, bonuses and vacations, inside a
+transaction that is rolled back at the end, so the check can run against a
+development database.
+"""
+import argparse, json, sys
+from datetime import date, timedelta
+
+from sqlalchemy import event, insert, select
+from sqlalchemy.orm import Session
+
+from app.db import engine
+from app.models import User, UserRole, Employment, WorkLog, Bonus, Vacation
+from app.payroll import compute_month, iter_team, month_bounds, team_member_ids, team_size
+
+HOT_TABLES = {"users", "bonuses", "vacations", "work_logs", "payroll_month_summary"}
+
+def seed(db: Session, teams: int, team_size: int, month: date) -> list[int]:
+    first, last = month_bounds(month)
+    managers = db.scalars(insert(User).returning(User.id), [
+        dict(email=f"explain-m{t}@example.com", first_name="M", last_name=f"M{t}", employee_code=f"XM{t}",
+             cnp=f"XM{t}", role=UserRole.manager, password_hash="")
+        for t in range(teams)
+    ]).all()
+    for t, manager_id in enumerate(managers):
+        ids = db.scalars(insert(User).returning(User.id), [
+            dict(email=f"explain-{t}-{i}@example.com", first_name="E", last_name=f"E{i}",
+                 employee_code=f"X{t}-{i}", cnp=f"X{t}-{i}", role=UserRole.employee,
+                 manager_id=manager_id, password_hash="")
+            for i in range(team_size)
+        ]).all()
+        db.execute(insert(Employment), [dict(user_id=u, hire_date=date(2020, 1, 1), base_salary=5000) for u in ids])
+        db.execute(insert(WorkLog), [
+            dict(user_id=u, work_date=first + timedelta(days=d), hours=8)
+            for u in ids for d in range((last - first).days + 1)
+        ])
+        db.execute(insert(Bonus), [dict(user_id=u, bonus_date=first + timedelta(days=u % 28), amount=100) for u in ids])
+        db.execute(insert(Vacation), [
+            dict(user_id=u, start_date=first + timedelta(days=u % 20), end_date=first + timedelta(days=u % 20 + 2), days=3)
+            for u in ids
+        ])
+    return managers
+
+def capture(db: Session, manager_id: int, month: date) -> list[tuple[str, object]]:
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    bind = db.get_bind().engine
+    event.listen(bind, "before_cursor_execute", record)
+    try:
+        team_size(db, manager_id)
+        team_member_ids(db, manager_id, limit=100)
+        compute_month(db, manager_id, month)
+        for _ in iter_team(db, manager_id, month):
+            pass
+    finally:
+        event.remove(bind, "before_cursor_execute", record)
+    return statements
+
+def seq_scans_postgres(db: Session, statement: str, parameters) -> tuple[list[str], str]:
+    plan = db.connection().exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, parameters).scalar()
+    plan = json.loads(plan) if isinstance(plan, str) else plan
+    found = []
+
+    def walk(node: dict):
+        if node.get("Node Type") == "Seq Scan" and node.get("Relation Name") in HOT_TABLES:
+            found.append(node["Relation Name"])
+        for child in node.get("Plans", []):
+            walk(child)
+
+    walk(plan[0]["Plan"])
+    return found, json.dumps(plan[0]["Plan"], indent=1)
+
+def seq_scans_sqlite(db: Session, statement: str, parameters) -> tuple[list[str], str]:
+    rows = db.connection().exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).all()
+    found = []
+    for row in rows:
+        words = row[-1].split()
+        if words[0] == "SCAN":  # SEARCH is an index lookup; a SCAN reads a whole table or index
+            found.append(words[1])
+    return found, "\n".join(row[-1] for row in rows)
+
+def explain_queries(db: Session, manager_id: int, month: date) -> list[tuple[str, list[str], str]]:
+    """(statement, scanned tables, plan) for every report query run for this manager and month."""
+    explain = seq_scans_postgres if db.get_bind().dialect.name == "postgresql" else seq_scans_sqlite
+    return [(statement, *explain(db, statement, parameters)) for statement, parameters in capture(db, manager_id, month)]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seed", type=int, default=0, metavar="TEAMS")
+    parser.add_argument("--team-size", type=int, default=50)
+    args = parser.parse_args()
+
+    month = date.today()
+
+    conn = engine.connect()
+    trans = conn.begin()
+    db = Session(bind=conn)
+    try:
+        if args.seed:
+            managers = seed(db, args.seed, args.team_size, month)
+            conn.exec_driver_sql("ANALYZE")
+            manager_id = managers[len(managers) // 2]
+        else:
+            manager_id = db.scalar(select(User.id).where(User.role == UserRole.manager).limit(1))
+            if manager_id is None:
+                sys.exit("No manager in the database; run with --seed")
+
+        failures = 0
+        for statement, tables, plan in explain_queries(db, manager_id, month):
+            summary = " ".join(statement.split())[:100]
+            if tables:
+                failures += 1
+                print(f"SEQ SCAN on {', '.join(sorted(set(tables)))}: {summary}\n{plan}\n")
+            else:
+                print(f"ok  {summary}")
+    finally:
+        db.close()
+        trans.rollback()
+        conn.close()
+
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Move archive files written before the content-addressed store into it, and
+optionally delete blobs nothing refers to any more.
+
+    python -m scripts.import_archive [--gc]
+
+Every file in storage/archive/{pdf,csv} without an archive_entries row is hashed,
+stored as a blob and re-linked, so identical copies end up sharing one file.
+Employee, manager and month are read from the usual names
+(slip_<user>_<YYYYMM>_*.pdf, aggregated_<manager>_<YYYYMM>_*.csv). --gc removes
+blobs no entry points to that have not been touched for an hour.
+"""
+import argparse, os, re, time
+from datetime import datetime
+
+from sqlalchemy import select
+
+from app.archive_store import ARCHIVE_KINDS, archive_file, archive_path, iter_blobs
+from app.db import SessionLocal
+from app.models import ArchiveEntry, User
+
+NAME_PATTERNS = {
+    "pdf": re.compile(r"slip_(?P<user>\d+)_(?P<month>\d{6})_"),
+    "csv": re.compile(r"aggregated_(?P<manager>\d+)_(?P<month>\d{6})_"),
+}
+
+def import_kind(db, kind: str) -> int:
+    directory = os.path.dirname(archive_path(kind, "x"))
+    if not os.path.isdir(directory):
+        return 0
+    known = set(db.scalars(select(ArchiveEntry.name).where(ArchiveEntry.kind == kind)))
+    managers = dict(db.execute(select(User.id, User.manager_id)).all())
+    count = 0
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if name in known or not os.path.isfile(path) or name.endswith(".tmp"):
+            continue
+        meta = {}
+        m = NAME_PATTERNS[kind].match(name)
+        if m:
+            month = datetime.strptime(m["month"], "%Y%m").date()
+            if kind == "pdf":
+                user_id = int(m["user"])
+                meta = dict(user_id=user_id if user_id in managers else None,
+                            manager_id=managers.get(user_id), month=month)
+            else:
+                manager_id = int(m["manager"])
+                meta = dict(manager_id=manager_id if manager_id in managers else None, month=month)
+        archive_file(db, path, kind, name, **meta)
+        db.commit()
+        count += 1
+    return count
+
+def collect_garbage(db, min_age: float = 3600) -> int:
+    referenced = set(db.scalars(select(ArchiveEntry.sha256).distinct()))
+    removed = 0
+    for sha256, path in iter_blobs():
+        # ctime changes when a name is linked to the blob, so a blob being archived right now is never old
+        if sha256 not in referenced and os.stat(path).st_ctime < time.time() - min_age:
+            for variant in (path, path + ".gz", path + ".br"):
+                if os.path.exists(variant):
+                    os.remove(variant)
+            removed += 1
+    return removed
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--gc", action="store_true", help="delete blobs no archive entry refers to")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        for kind in ARCHIVE_KINDS:
+            print(f"Imported {import_kind(db, kind)} {kind} files.")
+        if args.gc:
+            print(f"Removed {collect_garbage(db)} unreferenced blobs.")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
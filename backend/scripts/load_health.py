@@ -0,0 +1,76 @@
+"""
+/health latency while a PDF batch runs, against a running API.
+
+    python -m scripts.load_health [base_url] [email] [password]
+
+Samples /health for a few seconds on an idle server, then again while the
+job queued by /createPdfForEmployees runs (polling its status_url until it is
+done or failed), and prints p50/p99/max for both phases.
+"""
+import json, sys, threading, time, urllib.request, uuid
+
+JOB_POLL_SECONDS = 0.5
+
+def request(url: str, data: dict | None = None, headers: dict | None = None, timeout: float = 600):
+    body = json.dumps(data).encode() if data is not None else None
+    req = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json", **(headers or {})},
+                                 method="POST" if body is not None else "GET")
+    with urllib.request.urlopen(req, timeout=timeout) as resp:
+        return json.loads(resp.read() or b"null")
+
+def sample_health(base: str, seconds: float, stop: threading.Event | None = None) -> list[float]:
+    timings = []
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline and not (stop and stop.is_set()):
+        t0 = time.perf_counter()
+        request(f"{base}/health", timeout=30)
+        timings.append((time.perf_counter() - t0) * 1000)
+        time.sleep(0.01)
+    return timings
+
+def report(name: str, timings: list[float]):
+    timings = sorted(timings)
+    if not timings:
+        print(f"{name:<12} no samples")
+        return
+    p = lambda q: timings[min(len(timings) - 1, int(len(timings) * q))]
+    print(f"{name:<12} n={len(timings):5d}  p50={p(0.5):8.2f} ms  p99={p(0.99):8.2f} ms  max={timings[-1]:8.2f} ms")
+
+def main():
+    base = sys.argv[1] if len(sys.argv) > 1 else "http://127.0.0.1:8000"
+    email = sys.argv[2] if len(sys.argv) > 2 else "manager@example.com"
+    password = sys.argv[3] if len(sys.argv) > 3 else "Passw0rd!"
+
+    token = request(f"{base}/auth/login", {"email": email, "password": password})["access_token"]
+    headers = {"Authorization": f"Bearer {token}", "Idempotency-Key": str(uuid.uuid4())}
+
+    report("idle", sample_health(base, 3))
+
+    done = threading.Event()
+    batch = {}
+
+    def run_batch():
+        # the endpoint only queues the job; the load is the worker rendering it
+        t0 = time.perf_counter()
+        try:
+            queued = request(f"{base}/createPdfForEmployees", {}, headers)
+            status_url = base + queued["status_url"]
+            while (job := request(status_url, headers=headers))["status"] not in ("done", "failed"):
+                time.sleep(JOB_POLL_SECONDS)
+            batch["job"] = job
+        finally:
+            batch["seconds"] = time.perf_counter() - t0
+            done.set()
+
+    threading.Thread(target=run_batch, daemon=True).start()
+    report("during-batch", sample_health(base, 600, stop=done))
+    done.wait()
+    job = batch.get("job")
+    if job is None:
+        print(f"batch        no job result after {batch['seconds']:.2f} s (see the error above)")
+        return
+    print(f"batch        job {job['id']} {job['status']}: {job['processed']}/{job['total']} slips, "
+          f"{job['failed']} failed, in {batch['seconds']:.2f} s" + (f" ({job['error']})" if job["error"] else ""))
+
+if __name__ == "__main__":
+    main()
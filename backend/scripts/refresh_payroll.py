@@ -0,0 +1,30 @@
+"""
+Recompute payroll_month_summary for a month.
+
+    python -m scripts.refresh_payroll [YYYY-MM] [--manager ID]
+
+Needed after changes the ORM change tracking cannot see: bulk SQL on work_logs,
+bonuses, vacations or employment, or a different HOLIDAY_CALENDAR.
+"""
+import argparse
+from datetime import date, datetime
+
+from app.db import SessionLocal
+from app.payroll import refresh_month
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("month", nargs="?", help="YYYY-MM, default: current month")
+    parser.add_argument("--manager", type=int, help="only this manager's team")
+    args = parser.parse_args()
+
+    month = datetime.strptime(args.month, "%Y-%m").date() if args.month else date.today()
+    db = SessionLocal()
+    try:
+        count = refresh_month(db, month, args.manager)
+    finally:
+        db.close()
+    print(f"Refreshed {count} payroll summaries for {month:%Y-%m}.")
+
+if __name__ == "__main__":
+    main()
@@ -5,25 +5,19 @@ from sqlalchemy.orm import Session
 from sqlalchemy import select
 from app.db import SessionLocal
 from app.models import User, Vacation, Bonus, WorkLog
+from app.workdays import business_days, iter_business_days
 
 def first_last_day_of_month(d: date):
     first = d.replace(day=1)
     last = d.replace(day=calendar.monthrange(d.year, d.month)[1])
     return first, last
 
-def weekdays_in_range(start: date, end: date):
-    cur = start
-    while cur <= end:
-        if cur.weekday() < 5:  # 0=Mon..4=Fri
-            yield cur
-        cur += timedelta(days=1)
-
 def get_user_by_email(db: Session, email: str) -> User | None:
     return db.scalar(select(User).where(User.email == email))
 
 def ensure_vacation(db: Session, user_id: int, start: date, end: date):
-    # compute days as inclusive difference on weekdays only
-    days = sum(1 for d in weekdays_in_range(start, end))
+    # inclusive count of business days (weekdays minus public holidays)
+    days = business_days(start, end)
     v = Vacation(user_id=user_id, start_date=start, end_date=end, days=days)
     db.add(v)
 
@@ -32,7 +26,7 @@ def ensure_bonus(db: Session, user_id: int, day: date, amount: float, reason: st
     db.add(b)
 
 def ensure_worklogs(db: Session, user_id: int, start: date, end: date, skip_days:set[date]):
-    for d in weekdays_in_range(start, end):
+    for d in iter_business_days(start, end):
         if d in skip_days:
             continue
         # 8h default
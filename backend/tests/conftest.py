@@ -0,0 +1,71 @@
+"""
+Tests run against a throwaway SQLite database per test; nothing else (Postgres,
+SMTP) is needed. The app's own engine is pointed at an in-memory database so
+importing app modules never connects anywhere.
+"""
+import os
+
+os.environ["DATABASE_URL"] = "sqlite://"
+
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+
+from app.db import Base
+from app.models import User, UserRole, Employment, WorkLog, Bonus, Vacation
+
+MONTH = date(2024, 3, 1)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(engine):
+    with Session(engine, autoflush=False) as session:
+        yield session
+
+
+@pytest.fixture
+def count_queries(engine):
+    """`with count_queries() as statements:` collects the SQL run inside the block."""
+    @contextmanager
+    def counting():
+        statements: list[str] = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    return counting
+
+
+def make_team(db: Session, size: int, month: date = MONTH) -> User:
+    """A manager with `size` employees, each with 10 work days, a bonus and a vacation in `month`."""
+    manager = User(email="manager@example.com", first_name="Mara", last_name="Manager",
+                   employee_code="MGR", cnp="2990101012345", role=UserRole.manager)
+    db.add(manager)
+    db.flush()
+    for i in range(size):
+        user = User(email=f"e{i}@example.com", first_name=f"E{i}", last_name=f"L{i:05d}", employee_code=f"E{i}",
+                    cnp=f"1{i:012d}", role=UserRole.employee, manager_id=manager.id)
+        db.add(user)
+        db.flush()
+        db.add(Employment(user_id=user.id, hire_date=date(2023, 1, 1), base_salary=7000 + i))
+        db.add_all(WorkLog(user_id=user.id, work_date=month + timedelta(days=d), hours=8) for d in range(10))
+        db.add(Bonus(user_id=user.id, bonus_date=month, amount=100 * i))
+        db.add(Vacation(user_id=user.id, start_date=month + timedelta(days=10), end_date=month + timedelta(days=14), days=5))
+    db.commit()
+    return manager
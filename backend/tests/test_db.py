@@ -0,0 +1,34 @@
+import sqlite3
+
+import pytest
+from sqlalchemy import exc
+
+from app.db import TimedQueuePool, _check_backend
+
+
+def test_pool_counts_only_checkout_timeouts(tmp_path):
+    pool = TimedQueuePool(lambda: sqlite3.connect(tmp_path / "pool.db"), pool_size=1, max_overflow=0, timeout=0.01)
+    held = pool.connect()
+    with pytest.raises(exc.TimeoutError):
+        pool.connect()
+    held.close()
+
+    assert (pool.checkouts, pool.timeouts) == (2, 1)
+
+
+def test_pool_does_not_count_connect_errors_as_timeouts():
+    def refuse():
+        raise sqlite3.OperationalError("unable to open database file")
+
+    pool = TimedQueuePool(refuse, pool_size=1, max_overflow=0, timeout=0.01)
+    with pytest.raises(sqlite3.OperationalError):
+        pool.connect()
+
+    assert (pool.checkouts, pool.timeouts) == (1, 0)
+
+
+def test_unsupported_database_is_refused_at_startup():
+    with pytest.raises(RuntimeError, match="mysql, which is not supported"):
+        _check_backend("mysql+pymysql://app:secret@db/app")
+    _check_backend("postgresql+psycopg2://app:secret@db/app")
+    _check_backend("sqlite:///app.db")
@@ -0,0 +1,56 @@
+import smtplib
+
+from app.emailer import SMTPPool, build_message
+
+
+class FakeSMTP:
+    def __init__(self, failures: dict[str, Exception]):
+        self.failures = failures
+        self.sent: list[str] = []
+
+    def send_message(self, msg):
+        error = self.failures.get(msg["To"])
+        if error is not None:
+            raise error
+        self.sent.append(msg["To"])
+
+    def close(self):
+        pass
+
+
+def message(to: str):
+    return build_message(subject="Slip", sender="noreply@example.com", recipients=[to], body="Hello")
+
+
+def test_send_many_reports_smtp_errors_per_message(monkeypatch):
+    """SMTP errors fail their own message only; send_many still delivers the rest."""
+    smtp = FakeSMTP({
+        "b@example.com": smtplib.SMTPNotSupportedError("SMTPUTF8 not supported"),
+        "c@example.com": smtplib.SMTPResponseException(550, b"mailbox unavailable"),
+    })
+    pool = SMTPPool("localhost", 1025, size=2, max_retries=1, backoff=0)
+    monkeypatch.setattr(pool, "_connect", lambda: smtp)
+
+    results = pool.send_many([message(f"{name}@example.com") for name in "abcd"])
+
+    assert [r.ok for r in results] == [True, False, False, True]
+    assert "SMTPNotSupportedError" in results[1].error
+    assert results[1].attempts == 1  # not retried: it would fail the same way
+    assert results[2].error.startswith("550")
+    assert sorted(smtp.sent) == ["a@example.com", "d@example.com"]
+
+
+def test_dropped_session_is_retried(monkeypatch):
+    class DropOnce(FakeSMTP):
+        def send_message(self, msg):
+            if not self.failures.pop("dropped", None):
+                return super().send_message(msg)
+            raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+
+    smtp = DropOnce({"dropped": True})
+    pool = SMTPPool("localhost", 1025, size=1, max_retries=1, backoff=0)
+    monkeypatch.setattr(pool, "_connect", lambda: smtp)
+
+    result = pool.send(message("a@example.com"))
+
+    assert result.ok and result.attempts == 2
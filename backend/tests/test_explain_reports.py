@@ -0,0 +1,19 @@
+import pytest
+
+from app.config import settings
+from scripts.explain_reports import explain_queries, seed
+from tests.conftest import MONTH
+
+
+@pytest.mark.parametrize("payroll_summary", [True, False])
+def test_report_queries_never_scan_a_table(db, monkeypatch, payroll_summary):
+    monkeypatch.setattr(settings, "payroll_summary", payroll_summary)
+    managers = seed(db, teams=10, team_size=20, month=MONTH)
+    db.commit()
+    db.connection().exec_driver_sql("ANALYZE")
+
+    results = explain_queries(db, managers[len(managers) // 2], MONTH)
+
+    assert any("vacations" in statement for statement, _, _ in results)
+    scans = [f"{', '.join(tables)}: {statement}\n{plan}" for statement, tables, plan in results if tables]
+    assert not scans, "\n\n".join(scans)
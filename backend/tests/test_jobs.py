@@ -0,0 +1,24 @@
+from app import jobs
+from app.config import settings
+from app.jobs import enqueue_job, job_handler, run_job
+from tests.conftest import MONTH, make_team
+
+
+def test_job_result_keeps_every_outcome(db, monkeypatch):
+    """Per-employee outcomes of every chunk end up in the job result; only failures count as failed."""
+    monkeypatch.setattr(settings, "job_chunk_size", 2)
+    monkeypatch.setattr(jobs, "JOB_HANDLERS", dict(jobs.JOB_HANDLERS))
+
+    @job_handler("deliver")
+    def deliver(db, job, records):
+        sent = [{"email": r.email} for r in records if r.employee_code != "E1"]
+        failed = [{"email": r.email, "error": "550"} for r in records if r.employee_code == "E1"]
+        return {"sent": sent, "failures": failed}
+
+    manager_id = make_team(db, 5).id
+    job = enqueue_job(db, "deliver", manager_id, MONTH)
+    run_job(db, job)
+
+    assert (job.status, job.processed, job.failed) == ("done", 5, 1)
+    assert sorted(item["email"] for item in job.result["sent"]) == [f"e{i}@example.com" for i in (0, 2, 3, 4)]
+    assert job.result["failures"] == [{"email": "e1@example.com", "error": "550"}]
@@ -0,0 +1,38 @@
+"""
+The frontend's nginx must not proxy the unauthenticated operational endpoints.
+nginx is not needed: the config only has prefix locations, so the one serving a URI
+is the longest prefix that matches it (an `=` location wins on an exact match).
+"""
+import os, re
+
+import pytest
+
+CONF = os.path.join(os.path.dirname(__file__), "..", "..", "frontend", "nginx.conf")
+_LOCATION = re.compile(r"location\s+(=\s*|\^~\s*)?(\S+)\s*\{(.*?)\n  \}", re.S)
+
+
+def locations() -> list[tuple[str, str, str]]:
+    with open(CONF) as f:
+        return [(modifier.strip(), prefix, body) for modifier, prefix, body in _LOCATION.findall(f.read())]
+
+
+def served_by(uri: str) -> str:
+    """Body of the location nginx picks for `uri`."""
+    blocks = locations()
+    assert blocks and not any(m == "~" for m, _, _ in blocks), "regex locations are not modelled"
+    for modifier, prefix, body in blocks:
+        if modifier == "=" and prefix == uri:
+            return body
+    matching = [(prefix, body) for modifier, prefix, body in blocks if modifier != "=" and uri.startswith(prefix)]
+    return max(matching, key=lambda m: len(m[0]))[1]
+
+
+@pytest.mark.parametrize("uri", ["/api/metrics", "/api/metrics/", "/api/health/db", "/api/health/executors"])
+def test_operational_endpoints_are_refused(uri):
+    body = served_by(uri)
+    assert "deny all;" in body and "proxy_pass" not in body
+
+
+@pytest.mark.parametrize("uri", ["/api/health", "/api/archives", "/api/files/archive/csv/a.csv", "/api/jobs/1"])
+def test_api_is_proxied(uri):
+    assert "proxy_pass http://backend:8000/;" in served_by(uri)
@@ -0,0 +1,58 @@
+import os, subprocess, sys
+
+import pytest
+
+from app.payroll import aggregate_team, month_bounds
+from tests.conftest import MONTH, make_team
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.mark.parametrize("team_size", [1, 50])
+def test_aggregate_team_runs_two_queries_whatever_the_team_size(db, count_queries, team_size):
+    manager_id = make_team(db, team_size).id
+    month_start, month_end = month_bounds(MONTH)
+
+    with count_queries() as statements:
+        records = aggregate_team(db, manager_id, month_start, month_end)
+
+    assert len(records) == team_size
+    assert len(statements) == 2, statements
+
+
+def test_aggregate_team_figures(db):
+    manager = make_team(db, 3)
+    records = {r.employee_code: r for r in aggregate_team(db, manager.id, *month_bounds(MONTH))}
+
+    rec = records["E2"]
+    assert rec.base_salary == 7002
+    assert rec.working_days == 10
+    assert rec.bonus_total == 200
+    assert rec.vacation_days == 5  # 2024-03-11..15, Monday to Friday
+
+
+def test_writes_mark_summaries_stale_without_importing_payroll(tmp_path):
+    """The change tracking comes with the models; scripts need not import app.payroll for it."""
+    script = f"""
+import sys
+from datetime import date
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+from app.db import Base
+from app.models import PayrollMonthSummary, User, UserRole, WorkLog
+
+engine = create_engine("sqlite:///{tmp_path / 'script.db'}")
+Base.metadata.create_all(engine)
+with Session(engine) as db:
+    user = User(email="e@example.com", first_name="E", last_name="L", employee_code="E",
+                cnp="1000000000001", role=UserRole.employee)
+    db.add(user)
+    db.flush()
+    db.add(WorkLog(user_id=user.id, work_date=date(2024, 3, 4), hours=8))
+    db.commit()
+    print(db.execute(select(PayrollMonthSummary.month, PayrollMonthSummary.version)).all())
+"""
+    out = subprocess.run([sys.executable, "-c", script], cwd=BACKEND, env={**os.environ, "DATABASE_URL": "sqlite://"},
+                         capture_output=True, text=True, check=True).stdout
+
+    assert out.strip() == "[(datetime.date(2024, 3, 1), 1)]"
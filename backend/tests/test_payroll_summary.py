@@ -0,0 +1,104 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import select
+
+from app.models import Bonus, User, Vacation, WorkLog
+from app.payroll import compute_month
+from tests.conftest import MONTH, make_team
+
+APRIL, MAY = date(2024, 4, 1), date(2024, 5, 1)
+
+
+def figures(db, manager_id: int, month: date) -> dict[str, tuple]:
+    return {r.employee_code: (r.working_days, r.vacation_days, r.bonus_total)
+            for r in compute_month(db, manager_id, month)}
+
+
+@pytest.fixture
+def team(db):
+    """Two employees with current March summaries (each: 10 work days, 5 vacation days, bonus 100 * i)."""
+    manager_id = make_team(db, 2).id
+    assert figures(db, manager_id, MONTH) == {"E0": (10, 5, 0), "E1": (10, 5, 100)}
+    return manager_id
+
+
+def employee(db, code: str) -> User:
+    return db.scalar(select(User).where(User.employee_code == code))
+
+
+def first(db, model, user: User):
+    return db.scalar(select(model).where(model.user_id == user.id).order_by(model.id))
+
+
+def test_summary_follows_new_rows(db, team):
+    db.add(Bonus(user_id=employee(db, "E0").id, bonus_date=MONTH, amount=50))
+    db.commit()
+
+    assert figures(db, team, MONTH)["E0"] == (10, 5, 50)
+
+
+def test_bonus_moved_to_another_month(db, team):
+    bonus = first(db, Bonus, employee(db, "E1"))
+    db.commit()  # expires the bonus: its old date is only in the database
+    bonus.bonus_date = MAY
+    db.commit()
+
+    assert figures(db, team, MONTH)["E1"] == (10, 5, 0)
+    assert figures(db, team, MAY)["E1"] == (0, 0, 100)
+
+
+def test_bonus_moved_to_another_employee(db, team):
+    bonus = first(db, Bonus, employee(db, "E1"))
+    db.commit()
+    bonus.user_id = employee(db, "E0").id
+    db.commit()
+
+    assert figures(db, team, MONTH) == {"E0": (10, 5, 100), "E1": (10, 5, 0)}
+
+
+def test_work_log_moved_to_another_month(db, team):
+    log = first(db, WorkLog, employee(db, "E0"))
+    db.commit()
+    log.work_date = APRIL
+    db.commit()
+
+    assert figures(db, team, MONTH)["E0"] == (9, 5, 0)
+    assert figures(db, team, APRIL)["E0"] == (1, 0, 0)
+
+
+def test_work_log_deleted(db, team):
+    log = first(db, WorkLog, employee(db, "E0"))
+    db.commit()
+    db.delete(log)
+    db.commit()
+
+    assert figures(db, team, MONTH)["E0"] == (9, 5, 0)
+
+
+def test_vacation_moved_to_another_month(db, team):
+    vacation = first(db, Vacation, employee(db, "E0"))
+    db.commit()
+    vacation.start_date, vacation.end_date = date(2024, 4, 8), date(2024, 4, 9)
+    db.commit()
+
+    assert figures(db, team, MONTH)["E0"] == (10, 0, 0)
+    assert figures(db, team, APRIL)["E0"] == (0, 2, 0)
+
+
+def test_vacation_deleted(db, team):
+    vacation = first(db, Vacation, employee(db, "E1"))
+    db.commit()
+    db.delete(vacation)
+    db.commit()
+
+    assert figures(db, team, MONTH)["E1"] == (10, 0, 100)
+
+
+def test_bonus_deleted(db, team):
+    bonus = first(db, Bonus, employee(db, "E1"))
+    db.commit()
+    db.delete(bonus)
+    db.commit()
+
+    assert figures(db, team, MONTH)["E1"] == (10, 5, 0)
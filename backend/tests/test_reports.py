@@ -0,0 +1,35 @@
+import os
+from datetime import datetime
+
+from sqlalchemy import select
+from sqlalchemy.orm import sessionmaker
+
+from app import archive_store, routers_reports
+from app.models import ArchiveEntry
+from tests.conftest import MONTH, make_team
+
+
+class FrozenDatetime(datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return cls(2024, 3, 15, 12, 0, 0)
+
+
+def test_exports_in_the_same_second_are_archived_separately(db, engine, tmp_path, monkeypatch):
+    blobs = str(tmp_path / "archive" / "blobs")
+    monkeypatch.setattr(archive_store, "ARCHIVE_DIR", str(tmp_path / "archive"))
+    monkeypatch.setattr(archive_store, "BLOB_DIR", blobs)
+    monkeypatch.setattr(routers_reports, "BLOB_DIR", blobs)
+    monkeypatch.setattr(routers_reports, "SessionLocal", sessionmaker(engine))
+    monkeypatch.setattr(routers_reports, "datetime", FrozenDatetime)
+    manager_id = make_team(db, 3).id
+
+    names = [routers_reports.archive_csv_name(f"aggregated_{manager_id}_202403.csv") for _ in range(2)]
+    exports = [routers_reports.stream_team_csv(manager_id, MONTH, name) for name in names]
+    first = next(exports[0])
+    bodies = [first + "".join(exports[0]), "".join(exports[1])]  # the second export runs while the first is open
+
+    assert names[0] != names[1]
+    assert bodies[0] == bodies[1]
+    assert sorted(db.scalars(select(ArchiveEntry.name))) == sorted(names)
+    assert not [f for f in os.listdir(blobs) if f.endswith(".part")]
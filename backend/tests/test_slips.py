@@ -0,0 +1,94 @@
+import io
+from dataclasses import replace
+
+import pytest
+from pypdf import PdfReader
+from reportlab.lib.pdfencrypt import StandardEncryption
+from reportlab.pdfgen import canvas
+
+from app import slip_templates, slips
+from app.config import settings
+from app.slip_templates import SLIP_TEMPLATES, compile_slip_template, get_slip_template, register_slip_template
+
+FIELDS = dict(
+    full_name="Ana Pop", employee_code="E1", cnp="2900101123456", month_label="March 2024",
+    base_salary=7000.0, working_days=20, vacation_days=1, bonus_total=100.0, total_salary=7100.0,
+)
+
+
+SLIP_FONTS = ["Helvetica-Bold", "Helvetica", "Helvetica-Oblique", "Helvetica"]  # title, labels, footer, values
+
+
+def fonts_used(pdf: bytes, password: str | None = None) -> list[str]:
+    """Base font of every Tf operator on the first page, in order (the canvas preamble sets one first)."""
+    reader = PdfReader(io.BytesIO(pdf))
+    if password:
+        reader.decrypt(password)
+    page = reader.pages[0]
+    resources = page["/Resources"]["/Font"]
+    ops = page.get_contents().operations
+    return [resources[operands[0]]["/BaseFont"].lstrip("/") for operands, op in ops if op == b"Tf"]
+
+
+def test_static_layer_fonts_follow_the_target_canvas():
+    """A canvas that already named other fonts must not shift the template's fonts."""
+    compiled = compile_slip_template("default", FIELDS["month_label"])
+    buf = io.BytesIO()
+    c = canvas.Canvas(buf, pageCompression=0)
+    c.setFont("Courier", 10)  # takes the internal name the title font had at compile time
+    c.setFont("Times-Roman", 10)
+    compiled.draw(c, FIELDS)
+    c.save()
+
+    assert fonts_used(buf.getvalue())[-4:] == SLIP_FONTS
+
+
+def test_rendered_slip_fonts():
+    pdf = slips.gen_pdf_bytes(**FIELDS)
+
+    assert fonts_used(pdf, FIELDS["cnp"])[-4:] == SLIP_FONTS
+
+
+@pytest.fixture
+def process_rendering(monkeypatch):
+    monkeypatch.setattr(settings, "pdf_render_mode", "process")
+    monkeypatch.setattr(settings, "pdf_chunk_size", 1)
+    monkeypatch.setattr(settings, "pdf_pool_size", 1)
+    monkeypatch.setattr(slip_templates, "SLIP_TEMPLATES", dict(SLIP_TEMPLATES))
+    yield
+    slips.shutdown_render_pool()
+    compile_slip_template.cache_clear()
+
+
+def test_pool_workers_use_templates_registered_at_runtime(process_rendering):
+    register_slip_template(replace(get_slip_template("default"), name="runtime", version=1, title="Fluturas"))
+    batch = [dict(FIELDS, template="runtime"), dict(FIELDS, employee_code="E2")]
+
+    pdfs = dict(slips.render_slips(batch))
+
+    titles = []
+    for idx in range(len(batch)):
+        reader = PdfReader(io.BytesIO(pdfs[idx]))
+        reader.decrypt(FIELDS["cnp"])
+        titles.append(reader.pages[0].extract_text().splitlines()[0])
+    assert titles == ["Fluturas", "Salary Slip"]
+
+
+@pytest.mark.parametrize("strength", [40, 128])
+def test_slip_encryption_matches_reportlab(strength):
+    """Same keys and ciphertext as ReportLab's own RC4, only faster (128-bit is what slips use)."""
+    ours = slips.SlipEncryption(FIELDS["cnp"], ownerPassword="owner", strength=strength)
+    stock = StandardEncryption(FIELDS["cnp"], ownerPassword="owner", strength=strength)
+    for enc in (ours, stock):
+        enc.prepare(None, overrideID=b"0123456789abcdef")
+        enc.register(0x1234567, 3)
+
+    assert (ours.O, ours.U, ours.key, ours.P) == (stock.O, stock.U, stock.key, stock.P)
+    assert ours.encode(b"BT /F1 12 Tf (Ana Pop) Tj ET") == stock.encode(b"BT /F1 12 Tf (Ana Pop) Tj ET")
+    assert ours.encode("Fluturas") == stock.encode("Fluturas")
+
+
+def test_slip_encryption_leaves_reportlab_alone():
+    from reportlab.lib import arciv
+
+    assert arciv.ArcIV.__module__ == "reportlab.lib.arciv"
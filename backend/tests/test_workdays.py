@@ -0,0 +1,91 @@
+import random
+from datetime import date, timedelta
+
+import pytest
+
+from app import workdays
+from app.workdays import (HOLIDAY_CALENDARS, orthodox_easter, overlap_business_days_many, romanian_holidays,
+                          weekdays_between)
+
+
+def naive(start: date, end: date, holidays: set[date]) -> int:
+    days, cur = 0, start
+    while cur <= end:
+        if cur.weekday() < 5 and cur not in holidays:
+            days += 1
+        cur += timedelta(days=1)
+    return days
+
+
+def random_span(rng: random.Random) -> tuple[date, date]:
+    start = date(2000, 1, 1) + timedelta(days=rng.randrange(365 * 40))
+    return start, start + timedelta(days=rng.randrange(-3, 120))
+
+
+@pytest.mark.parametrize("year, easter", [
+    (2021, date(2021, 5, 2)),
+    (2022, date(2022, 4, 24)),
+    (2023, date(2023, 4, 16)),
+    (2024, date(2024, 5, 5)),
+    (2025, date(2025, 4, 20)),
+    (2026, date(2026, 4, 12)),
+])
+def test_orthodox_easter(year, easter):
+    assert orthodox_easter(year) == easter
+
+
+def test_romanian_holidays_2024():
+    assert romanian_holidays(2024) == [
+        date(2024, 1, 1), date(2024, 1, 2), date(2024, 1, 6), date(2024, 1, 7), date(2024, 1, 24),
+        date(2024, 5, 1), date(2024, 5, 3), date(2024, 5, 5), date(2024, 5, 6), date(2024, 6, 1),
+        date(2024, 6, 23), date(2024, 6, 24), date(2024, 8, 15), date(2024, 11, 30), date(2024, 12, 1),
+        date(2024, 12, 25), date(2024, 12, 26),
+    ]
+
+
+def test_epiphany_holidays_start_in_2024():
+    assert date(2023, 1, 6) not in romanian_holidays(2023)
+    assert date(2024, 1, 6) in romanian_holidays(2024)
+
+
+def test_ro_business_days_in_may_2024():
+    # 23 weekdays, minus May 1 (Wed), Good Friday May 3 and Easter Monday May 6
+    assert HOLIDAY_CALENDARS["ro"].business_days(date(2024, 5, 1), date(2024, 5, 31)) == 20
+    assert HOLIDAY_CALENDARS["none"].business_days(date(2024, 5, 1), date(2024, 5, 31)) == 23
+
+
+def test_weekdays_between_matches_day_by_day():
+    rng = random.Random(1234)
+    for _ in range(5000):
+        s, e = random_span(rng)
+        assert weekdays_between(s, e) == naive(s, e, set()), (s, e)
+
+
+@pytest.mark.parametrize("name", sorted(HOLIDAY_CALENDARS))
+def test_business_days_matches_day_by_day(name):
+    cal = HOLIDAY_CALENDARS[name]
+    rng = random.Random(name)
+    for _ in range(2000):
+        s, e = random_span(rng)
+        holidays = {d for y in range(s.year, e.year + 1) for d in cal.rule(y)} if cal.rule else set()
+        assert cal.business_days(s, e) == naive(s, e, holidays), (s, e)
+
+
+@pytest.mark.parametrize("use_numpy", [True, False])
+@pytest.mark.parametrize("name", sorted(HOLIDAY_CALENDARS))
+def test_overlap_business_days_many(monkeypatch, name, use_numpy):
+    """Both the numpy.busday_count path and the pure Python one agree with a day-by-day count."""
+    if use_numpy and workdays.np is None:
+        pytest.skip("numpy not installed")
+    if not use_numpy:
+        monkeypatch.setattr(workdays, "np", None)
+    cal = HOLIDAY_CALENDARS[name]
+    rng = random.Random(f"{name}-{use_numpy}")
+    for _ in range(20):
+        month_start = date(rng.randrange(2000, 2040), rng.randrange(1, 13), 1)
+        month_end = (month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+        starts = [month_start + timedelta(days=rng.randrange(-40, 40)) for _ in range(200)]
+        spans = [(s, s + timedelta(days=rng.randrange(0, 30))) for s in starts]
+        holidays = set(cal.for_year(month_start.year))
+        expected = [naive(max(s, month_start), min(e, month_end), holidays) for s, e in spans]
+        assert overlap_business_days_many(spans, month_start, month_end, cal) == expected, month_start
@@ -1,4 +1,4 @@
-import { useEffect, useState } from "react";
+import { useEffect, useRef, useState } from "react";
 import { api } from "../api";
 import axios from "axios";
 
@@ -10,18 +10,47 @@ type User = {
   role: "manager" | "employee";
 };
 
+// GET /jobs/{id}, see job_status in backend/app/jobs.py
+type Job = {
+  id: number;
+  status: "queued" | "running" | "done" | "failed";
+  total: number;
+  processed: number;
+  failed: number;
+  progress: number;
+  result: any;
+  error: string | null;
+};
+
 type RunResult = {
   endpoint: string;
   ok?: boolean;
   error?: string;
   payload?: any;
+  job?: Job;
 };
 
+const JOB_POLL_MS = 1000;
+
+const errorMessage = (err: any) =>
+  axios.isAxiosError(err) ? err.response?.data?.detail || err.message : String(err);
+
 export default function Manager() {
   const [me, setMe] = useState<User | null>(null);
   const [busy, setBusy] = useState<string | null>(null);
   const [results, setResults] = useState<RunResult[]>([]);
-  const [archives, setArchives] = useState<{ csv: any[]; pdf: any[] }>({ csv: [], pdf: [] });
+  const unmounted = useRef(false);
+  const [archives, setArchives] = useState<{ csv: any[]; pdf: any[]; next?: { csv?: number; pdf?: number } }>({
+    csv: [],
+    pdf: [],
+  });
+
+  useEffect(() => {
+    unmounted.current = false;
+    return () => {
+      unmounted.current = true;  // stops job polling
+    };
+  }, []);
 
   useEffect(() => {
     const token = localStorage.getItem("token");
@@ -51,17 +80,48 @@ export default function Manager() {
 
   const run = async (endpoint: string, path: string) => {
     setBusy(endpoint);
+    let jobId: number | undefined;
     try {
       const res = await api.post(path, {});
-      setResults((prev) => [{ endpoint, ok: true, payload: res.data }, ...prev]);
-      // refresh archives after actions that may create/archive files
-      api.get("/archives").then((a) => setArchives(a.data)).catch(() => {});
+      jobId = res.data.job_id;
+      // the PDF endpoints only queue a job ({job_id, status_url}); its outcome comes from polling below
+      setResults((prev) => [{ endpoint, ok: jobId === undefined ? true : undefined, payload: res.data }, ...prev]);
+      if (jobId === undefined) {
+        // refresh archives after actions that may create/archive files
+        api.get("/archives").then((a) => setArchives(a.data)).catch(() => {});
+      }
     } catch (err: any) {
-      const msg = axios.isAxiosError(err) ? err.response?.data?.detail || err.message : String(err);
-      setResults((prev) => [{ endpoint, ok: false, error: msg }, ...prev]);
+      setResults((prev) => [{ endpoint, ok: false, error: errorMessage(err) }, ...prev]);
     } finally {
       setBusy(null);
     }
+    if (jobId !== undefined) await watchJob(jobId);
+  };
+
+  const updateJobResult = (jobId: number, update: Partial<RunResult>) =>
+    setResults((prev) => prev.map((r) => (r.payload?.job_id === jobId ? { ...r, ...update } : r)));
+
+  // poll the job until the worker finishes it, showing its progress in the run results
+  const watchJob = async (jobId: number) => {
+    while (!unmounted.current) {
+      let job: Job;
+      try {
+        job = (await api.get(`/jobs/${jobId}`)).data;
+      } catch (err: any) {
+        updateJobResult(jobId, { ok: false, error: `Could not get the job status: ${errorMessage(err)}` });
+        return;
+      }
+      if (job.status === "done" || job.status === "failed") {
+        const error = job.status === "failed"
+          ? job.error || "Job failed"
+          : job.failed > 0 ? `${job.failed} of ${job.total} employees failed` : undefined;
+        updateJobResult(jobId, { job, ok: error === undefined, error });
+        api.get("/archives").then((a) => setArchives(a.data)).catch(() => {});
+        return;
+      }
+      updateJobResult(jobId, { job });
+      await new Promise((resolve) => setTimeout(resolve, JOB_POLL_MS));
+    }
   };
 
   const logout = () => {
@@ -74,6 +134,29 @@ export default function Manager() {
     setArchives(a.data);
   };
 
+  // archives come in pages, newest first; fetch the next page of one list
+  const loadMoreArchives = async (kind: "csv" | "pdf") => {
+    const cursor = archives.next?.[kind];
+    if (!cursor) return;
+    const a = await api.get("/archives", { params: { kind, cursor } });
+    setArchives((prev) => ({
+      ...prev,
+      [kind]: [...prev[kind], ...a.data[kind]],
+      next: { ...prev.next, [kind]: a.data.next[kind] },
+    }));
+  };
+
+  // /files needs the bearer token, so a plain link can't fetch it: download through the api client
+  const downloadFile = async (f: any) => {
+    const res = await api.get(f.url, { responseType: "blob" });
+    const url = URL.createObjectURL(res.data);
+    const link = document.createElement("a");
+    link.href = url;
+    link.download = f.name;
+    link.click();
+    setTimeout(() => URL.revokeObjectURL(url), 60_000);
+  };
+
   return (
     <div className="min-h-screen bg-gray-50 p-6">
       <div className="max-w-3xl mx-auto">
@@ -125,14 +208,6 @@ export default function Manager() {
             <h2 className="font-semibold">Archives</h2>
             <div className="space-x-2">
               <button onClick={refreshArchives} className="text-sm bg-gray-200 px-2 py-1 rounded">Refresh</button>
-              <a
-                className="text-sm bg-gray-200 px-2 py-1 rounded"
-                href="http://127.0.0.1:8000/archives/browse_public"
-                target="_blank"
-                rel="noreferrer"
-              >
-                Open Archives Browser
-              </a>
               <a
                 className="text-sm bg-gray-200 px-2 py-1 rounded"
                 href="http://localhost:8025"
@@ -152,14 +227,19 @@ export default function Manager() {
                 <ul className="space-y-1">
                   {archives.csv.map((f: any, idx: number) => (
                     <li key={idx} className="text-sm">
-                      <a className="text-blue-600 underline" href={`http://127.0.0.1:8000${f.url}`} target="_blank" rel="noreferrer">
+                      <button className="text-blue-600 underline" onClick={() => downloadFile(f)}>
                         {f.name}
-                      </a>{" "}
+                      </button>{" "}
                       <span className="text-gray-500">— {f.modified} — {f.size_bytes} B</span>
                     </li>
                   ))}
                 </ul>
               )}
+              {archives.next?.csv && (
+                <button onClick={() => loadMoreArchives("csv")} className="text-sm bg-gray-200 px-2 py-1 rounded mt-2">
+                  Load more
+                </button>
+              )}
             </div>
             <div>
               <h3 className="font-medium mb-2">PDF</h3>
@@ -169,14 +249,19 @@ export default function Manager() {
                 <ul className="space-y-1">
                   {archives.pdf.map((f: any, idx: number) => (
                     <li key={idx} className="text-sm">
-                      <a className="text-blue-600 underline" href={`http://127.0.0.1:8000${f.url}`} target="_blank" rel="noreferrer">
+                      <button className="text-blue-600 underline" onClick={() => downloadFile(f)}>
                         {f.name}
-                      </a>{" "}
+                      </button>{" "}
                       <span className="text-gray-500">— {f.modified} — {f.size_bytes} B</span>
                     </li>
                   ))}
                 </ul>
               )}
+              {archives.next?.pdf && (
+                <button onClick={() => loadMoreArchives("pdf")} className="text-sm bg-gray-200 px-2 py-1 rounded mt-2">
+                  Load more
+                </button>
+              )}
             </div>
           </div>
         </div>
@@ -192,13 +277,36 @@ export default function Manager() {
                 <li key={idx} className="border rounded p-3">
                   <div className="flex items-center justify-between mb-2">
                     <span className="font-mono text-xs">{r.endpoint}</span>
-                    <span className={`text-xs ${r.ok ? "text-emerald-700" : "text-red-600"}`}>
-                      {r.ok ? "OK" : "ERROR"}
-                    </span>
+                    {r.ok === undefined ? (
+                      <span className="text-xs text-gray-600">
+                        {r.job?.status === "running" ? "RUNNING" : "QUEUED"}
+                      </span>
+                    ) : (
+                      <span className={`text-xs ${r.ok ? "text-emerald-700" : "text-red-600"}`}>
+                        {r.ok ? "OK" : "ERROR"}
+                      </span>
+                    )}
                   </div>
-                  <pre className="text-xs overflow-auto bg-gray-50 p-2 rounded">
-                    {JSON.stringify(r.ok ? r.payload : { error: r.error }, null, 2)}
-                  </pre>
+                  {r.job && (
+                    <div className="mb-2">
+                      <div className="h-2 bg-gray-200 rounded overflow-hidden">
+                        <div
+                          className={`h-2 ${r.job.failed > 0 || r.job.status === "failed" ? "bg-red-500" : "bg-emerald-500"}`}
+                          style={{ width: `${Math.round(r.job.progress * 100)}%` }}
+                        />
+                      </div>
+                      <p className="text-xs text-gray-600 mt-1">
+                        {r.job.processed} / {r.job.total} employees
+                        {r.job.failed > 0 && <span className="text-red-600"> — {r.job.failed} failed</span>}
+                      </p>
+                    </div>
+                  )}
+                  {r.error && <p className="text-xs text-red-600 mb-2">{r.error}</p>}
+                  {r.payload && (
+                    <pre className="text-xs overflow-auto bg-gray-50 p-2 rounded">
+                      {JSON.stringify(r.job && r.ok !== undefined ? r.job.result : r.payload, null, 2)}
+                    </pre>
+                  )}
                 </li>
               ))}
             </ul>